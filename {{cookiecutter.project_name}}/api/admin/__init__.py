@@ -1 +1 @@
-from .admin import router  # noqa
+from .admin import admin, router  # noqa
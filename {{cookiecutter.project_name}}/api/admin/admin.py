@@ -7,7 +7,10 @@ from core.config import settings
 from core.exceptions import setup_exception_handlers
 
 from .auth import FastapiUsersAuthenticationBackend
-
+from .diagnostics import DiagnosticsAdmin
+from .jobs import JobAdmin
+from .profiles import ProfileAdmin
+from .slow_queries import SlowQueryAdmin
 from .user import UserAdmin
 
 router = APIRouter()
@@ -23,6 +26,12 @@ admin = sqladmin.Admin(
     base_url="/",
     title=settings.PROJECT_NAME.title(),
 )
-for view in (UserAdmin, ):
+for view in (
+    UserAdmin,
+    JobAdmin,
+    SlowQueryAdmin,
+    ProfileAdmin,
+    DiagnosticsAdmin,
+):
     admin.add_view(view)
 setup_exception_handlers(admin.admin)
@@ -0,0 +1,40 @@
+import sqladmin
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import RedirectResponse
+
+from core.diagnostics import COMMANDS, diagnostics
+
+from .jobs import format_timestamp
+
+
+class DiagnosticsAdmin(sqladmin.BaseView):
+    name = "Diagnostics"
+    icon = "fa-solid fa-memory"
+
+    @sqladmin.expose("/diagnostics", methods=["GET"])
+    async def diagnostics_page(self, request: Request):
+        workers = await diagnostics.workers()
+        for worker in workers:
+            worker["updated_at"] = format_timestamp(worker["updated_at"])
+
+        return self.templates.TemplateResponse(
+            "admin/diagnostics.html",
+            context={
+                "request": request,
+                "admin_url": str(request.url_for("admin:index")).rstrip("/"),
+                "workers": workers,
+                "serving_worker": diagnostics.worker_id,
+                "commands": COMMANDS,
+            },
+        )
+
+    @sqladmin.expose("/diagnostics/command", methods=["POST"])
+    async def command(self, request: Request):
+        form = await request.form()
+        try:
+            await diagnostics.command(form.get("worker_id", ""), form.get("command"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        url = str(request.url_for("admin:index")).rstrip("/") + "/diagnostics"
+        return RedirectResponse(url, status_code=303)
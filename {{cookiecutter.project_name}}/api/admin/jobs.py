@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+import sqladmin
+from starlette.requests import Request
+
+from core import get_cache_context
+from core.jobs import job_queue
+
+
+def format_timestamp(value) -> str:
+    if not value:
+        return ""
+    return datetime.fromtimestamp(float(value), tz=timezone.utc).isoformat(
+        timespec="seconds"
+    )
+
+
+class JobAdmin(sqladmin.BaseView):
+    name = "Jobs"
+    icon = "fa-solid fa-list-check"
+
+    @sqladmin.expose("/jobs", methods=["GET"])
+    async def jobs_page(self, request: Request):
+        async with get_cache_context() as redis:
+            stats = await job_queue.stats(redis)
+            jobs = await job_queue.recent(redis)
+
+        for job in jobs:
+            for field in ("enqueued_at", "started_at", "finished_at"):
+                job[field] = format_timestamp(job.get(field))
+
+        return self.templates.TemplateResponse(
+            "admin/jobs.html",
+            context={"request": request, "stats": stats, "jobs": jobs},
+        )
@@ -0,0 +1,101 @@
+import sqladmin
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import RedirectResponse, Response
+
+from core import get_cache_context
+from core.config import settings
+from core.profiling import profiles, sign_profile_header
+
+from .jobs import format_timestamp
+
+
+class ProfileAdmin(sqladmin.BaseView):
+    name = "Profiles"
+    icon = "fa-solid fa-fire"
+
+    @sqladmin.expose("/profiles", methods=["GET"])
+    async def profiles_page(self, request: Request):
+        async with get_cache_context() as redis:
+            armed = await profiles.armed_routes(redis)
+            recent = await profiles.recent(redis)
+
+        for profile in recent:
+            profile["created_at"] = format_timestamp(profile["created_at"])
+
+        # a signed header profiles one request to the path, e.g. with curl
+        sign_path = request.query_params.get("sign")
+        return self.templates.TemplateResponse(
+            "admin/profiles.html",
+            context={
+                "request": request,
+                "admin_url": str(request.url_for("admin:index")).rstrip("/"),
+                "armed": armed,
+                "profiles": recent,
+                "header_name": settings.PROFILING_HEADER,
+                "sign_path": sign_path,
+                "header_value": sign_profile_header(sign_path) if sign_path else None,
+                "header_ttl": settings.PROFILING_HEADER_TTL,
+            },
+        )
+
+    @sqladmin.expose("/profiles/arm", methods=["POST"])
+    async def arm(self, request: Request):
+        form = await request.form()
+        path = form.get("path", "").strip()
+        try:
+            count = int(form.get("count", 1))
+            rate = float(form.get("rate", 1))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid count or rate")
+        if not path.startswith("/") or count < 1 or not 0 < rate <= 1:
+            raise HTTPException(status_code=400, detail="Invalid path, count or rate")
+
+        await profiles.arm(path, count, rate)
+        return self._back(request)
+
+    @sqladmin.expose("/profiles/disarm", methods=["POST"])
+    async def disarm(self, request: Request):
+        form = await request.form()
+        await profiles.disarm(form.get("path", ""))
+        return self._back(request)
+
+    @sqladmin.expose("/profiles/{profile_id}", methods=["GET"])
+    async def profile_page(self, request: Request):
+        profile = await self._get(request)
+        profile["created_at"] = format_timestamp(profile.get("created_at"))
+        return self.templates.TemplateResponse(
+            "admin/profile.html",
+            context={
+                "request": request,
+                "admin_url": str(request.url_for("admin:index")).rstrip("/"),
+                "profile": profile,
+            },
+        )
+
+    @sqladmin.expose("/profiles/{profile_id}/speedscope.json", methods=["GET"])
+    async def speedscope(self, request: Request):
+        profile = await self._get(request)
+        # open the file on https://www.speedscope.app for the flame graph
+        return Response(
+            profile["speedscope"],
+            media_type="application/json",
+            headers={
+                "Content-Disposition": (
+                    f'attachment; filename="profile-{profile["id"]}.speedscope.json"'
+                )
+            },
+        )
+
+    @staticmethod
+    async def _get(request: Request) -> dict:
+        async with get_cache_context() as redis:
+            profile = await profiles.get(redis, request.path_params["profile_id"])
+        if profile is None:
+            raise HTTPException(status_code=404)
+        return profile
+
+    @staticmethod
+    def _back(request: Request) -> RedirectResponse:
+        url = str(request.url_for("admin:index")).rstrip("/") + "/profiles"
+        return RedirectResponse(url, status_code=303)
@@ -0,0 +1,32 @@
+import sqladmin
+from starlette.requests import Request
+
+from core.slow_queries import slow_query_log
+
+from .jobs import format_timestamp
+
+
+class SlowQueryAdmin(sqladmin.BaseView):
+    name = "Slow queries"
+    icon = "fa-solid fa-gauge-high"
+
+    @sqladmin.expose("/slow-queries", methods=["GET"])
+    async def slow_queries_page(self, request: Request):
+        statements = []
+        for entry in slow_query_log.top():
+            statements.append(
+                {
+                    **entry,
+                    "mean_ms": entry["total_ms"] / entry["count"],
+                    "last_seen": format_timestamp(entry.get("last_seen")),
+                }
+            )
+
+        return self.templates.TemplateResponse(
+            "admin/slow_queries.html",
+            context={
+                "request": request,
+                "threshold_ms": slow_query_log.threshold_ms,
+                "statements": statements,
+            },
+        )
@@ -1,13 +1,20 @@
+import logging
 from functools import wraps
 from typing import Any, Dict
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from fastapi_health import health
 
 from core import get_cache_context, get_db_context
-from core.logging import logger
-from schemas import FailingHealthResponseSchema, HealthResponseSchema
+from core.drain import drain
+from schemas import (
+    FailingHealthResponseSchema,
+    HealthResponseSchema,
+    ReadinessResponseSchema,
+)
 
+# probes log per worker every few seconds, sample it with LOG_SAMPLE_RATES
+logger = logging.getLogger("main.health")
 router = APIRouter()
 
 
@@ -58,3 +65,19 @@ router.add_api_route(
     name="health",
     responses=responses,
 )
+
+
+@router.get(
+    "/ready",
+    name="ready",
+    response_model=ReadinessResponseSchema,
+    responses={503: {"model": ReadinessResponseSchema}},
+)
+async def ready(request: Request, response: Response):
+    """
+    Ready once the lifespan warm-up completed, not ready again while draining
+    """
+    is_ready = getattr(request.app.state, "ready", False) and not drain.draining
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready}
@@ -2,11 +2,12 @@ from fastapi import APIRouter, Request
 from starlette.templating import Jinja2Templates
 
 router = APIRouter()
+# templates compile once per process, warmed up in the app lifespan
+templates = Jinja2Templates("templates")
 
 
 @router.get("/")
 async def index(request: Request):
-    templates = Jinja2Templates("templates")
     return templates.TemplateResponse(
         "root.html",
         context={"request": request},
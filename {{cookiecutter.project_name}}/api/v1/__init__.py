@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
-from . import auth
+from . import auth, batch, ws
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
+api_router.include_router(batch.router, tags=["batch"])
+api_router.include_router(ws.router)
@@ -1,6 +1,7 @@
 import uuid
 
 from fastapi import APIRouter
+from fastapi.routing import APIRoute
 from fastapi_users import FastAPIUsers
 from fastapi_users.authentication import AuthenticationBackend, BearerTransport
 
@@ -29,6 +30,13 @@ current_active_superuser = fastapi_users.current_user(
 router.include_router(fastapi_users.get_auth_router(bearer_backend))
 router.include_router(fastapi_users.get_register_router(UserRead, UserCreate))
 router.include_router(fastapi_users.get_reset_password_router())
-router.include_router(
-    fastapi_users.get_users_router(UserRead, UserCreate), prefix="/users", tags=["user"]
-)
+
+users_router = fastapi_users.get_users_router(UserRead, UserCreate)
+# GET /users/me and /users/{id} are served from endpoints.py instead,
+# with sparse fieldsets and conditional requests
+users_router.routes = [
+    route
+    for route in users_router.routes
+    if not (isinstance(route, APIRoute) and "GET" in route.methods)
+]
+router.include_router(users_router, prefix="/users", tags=["user"])
@@ -1,14 +1,19 @@
 import typing
 import uuid
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
 
+from fastapi import Request
 from fastapi_users import BaseUserManager, UUIDIDMixin
 from fastapi_users.authentication import Authenticator, JWTStrategy
 
 from core import Database, get_db_context
 from core.config import settings
+from core.logging import logger
 from models.user import User, UserDatabase
 
+from .jobs import send_reset_password_email, send_verification_email, send_welcome_email
+
 
 class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     reset_password_token_secret = settings.SECRET_KEY
@@ -17,9 +22,46 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     def __init__(self, db: Database):
         super(UUIDIDMixin, self).__init__(user_db=UserDatabase(session=db))
 
+    # side effects run in the job worker, not in the request
+    async def on_after_register(
+        self, user: User, request: typing.Optional[Request] = None
+    ):
+        try:
+            await send_welcome_email.enqueue(str(user.id), user.email)
+        except Exception:
+            # the user is already committed, a missing welcome email isn't fatal
+            logger.exception(f"welcome email of user {user.id} wasn't enqueued")
+
+    async def on_after_forgot_password(
+        self, user: User, token: str, request: typing.Optional[Request] = None
+    ):
+        await send_reset_password_email.enqueue(str(user.id), user.email, token)
+
+    async def on_after_request_verify(
+        self, user: User, token: str, request: typing.Optional[Request] = None
+    ):
+        await send_verification_email.enqueue(str(user.id), user.email, token)
+
+
+# users already resolved for the current task, keyed by token. The batch endpoint
+# fills it for read-only sub-requests, so the user isn't loaded once per item
+resolved_users: ContextVar[typing.Optional[typing.Dict[str, User]]] = ContextVar(
+    "resolved_users", default=None
+)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    async def read_token(
+        self, token: typing.Optional[str], user_manager: BaseUserManager
+    ) -> typing.Optional[User]:
+        users = resolved_users.get()
+        if users is not None and token in users:
+            return users[token]
+        return await super().read_token(token, user_manager)
+
 
 async def get_strategy() -> JWTStrategy:
-    yield JWTStrategy(
+    yield CachedJWTStrategy(
         secret=settings.SECRET_KEY, lifetime_seconds=settings.JWT_TOKEN_EXPIRATION_TIME
     )
 
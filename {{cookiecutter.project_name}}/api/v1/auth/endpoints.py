@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, Response
+import typing
+import uuid
 
-from .base import bearer_backend, current_active_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+
+from core import Database
+from core.responses import response_media_type
+from core.utils import etag_matches, weak_etag
+from models.user import User
+from schemas.user import UserRead
+
+from .base import bearer_backend, current_active_user, fastapi_users
 from .deps import get_strategy
 
 router = APIRouter()
 
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
 
 @router.post("/refresh")
 async def refresh_jwt(
@@ -13,3 +25,88 @@ async def refresh_jwt(
     user=Depends(current_active_user),
 ):
     return await bearer_backend.login(strategy, user, response)
+
+
+def user_fields(
+    fields: typing.Optional[str] = Query(
+        None, description="Comma separated list of attributes to return"
+    )
+) -> typing.Optional[typing.Set[str]]:
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - UserRead.__fields__.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return requested
+
+
+def user_etag(user_id, updated_at, fields: typing.Optional[typing.Set[str]]) -> str:
+    # JSON and MessagePack bodies of one user are different representations
+    return weak_etag(
+        user_id,
+        updated_at,
+        ",".join(sorted(fields or ())),
+        response_media_type.get(),
+    )
+
+
+def not_modified(request: Request, etag: str) -> typing.Optional[Response]:
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        # bodyless, MessagePackMiddleware only adds Vary to JSON/MessagePack
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+    return None
+
+
+def user_response(response: Response, user: User, fields, etag: str) -> dict:
+    response.headers["ETag"] = etag
+    return UserRead.from_orm(user).dict(include=fields)
+
+
+@router.get(
+    "/users/me",
+    response_model=None,
+    responses={200: {"model": UserRead}, 304: {"description": "Not Modified"}},
+    name="users:current_user",
+    tags=["user"],
+)
+async def read_current_user(
+    request: Request,
+    response: Response,
+    user: User = Depends(current_active_user),
+    fields=Depends(user_fields),
+):
+    etag = user_etag(user.id, user.updated_at, fields)
+    return not_modified(request, etag) or user_response(response, user, fields, etag)
+
+
+@router.get(
+    "/users/{id}",
+    response_model=None,
+    responses={200: {"model": UserRead}, 304: {"description": "Not Modified"}},
+    name="users:user",
+    tags=["user"],
+    dependencies=[Depends(current_superuser)],
+)
+async def read_user(
+    id: uuid.UUID,
+    request: Request,
+    response: Response,
+    db: Database,
+    fields=Depends(user_fields),
+):
+    # the ETag only needs updated_at, the full row is loaded on a mismatch
+    row = (await db.execute(select(User.updated_at).where(User.id == id))).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404)
+
+    etag = user_etag(id, row.updated_at, fields)
+    if cached := not_modified(request, etag):
+        return cached
+
+    user = await db.get(User, id)
+    if user is None:
+        raise HTTPException(status_code=404)
+    return user_response(response, user, fields, etag)
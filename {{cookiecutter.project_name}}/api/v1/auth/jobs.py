@@ -0,0 +1,18 @@
+from core.jobs import job
+from core.logging import logger
+
+
+@job
+async def send_welcome_email(user_id: str, email: str):
+    # plug in the email backend here
+    logger.info(f"welcome email sent to user {user_id}")
+
+
+@job
+async def send_reset_password_email(user_id: str, email: str, token: str):
+    logger.info(f"reset password email sent to user {user_id}")
+
+
+@job
+async def send_verification_email(user_id: str, email: str, token: str):
+    logger.info(f"verification email sent to user {user_id}")
@@ -12,7 +12,7 @@ async def create_user(
     """
     This utility should only be called from trusted code, not from the user endpoints
     """
-    async with get_user_manager_context(expire_on_commit=False) as user_manager:
+    async with get_user_manager_context() as user_manager:
         return await user_manager.create(
             SuperuserUserCreate(
                 email=email,
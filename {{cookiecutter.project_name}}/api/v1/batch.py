@@ -0,0 +1,172 @@
+import asyncio
+import typing
+
+import orjson
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware
+from starlette.middleware.exceptions import ExceptionMiddleware
+from starlette.types import ASGIApp, Message
+
+from api.v1.auth.base import fastapi_users
+from api.v1.auth.deps import resolved_users
+from core.config import settings
+from core.deadline import deadline_watch
+from core.logging import logger
+from core.responses import JSON_MEDIA_TYPE, response_media_type
+from schemas.batch import (
+    BatchRequestItemSchema,
+    BatchRequestSchema,
+    BatchResponseSchema,
+)
+
+router = APIRouter()
+
+current_optional_user = fastapi_users.current_user(active=True, optional=True)
+
+# headers of the batch request which are passed on to every sub-request
+FORWARDED_HEADERS = ("authorization", "accept-language", "user-agent", "cookie")
+# the resolved user is only shared with sub-requests which can't modify it
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class BatchDispatcher:
+    """
+    Dispatches sub-requests straight to the router, skipping the outer
+    middleware stack (context, compression, CORS) the batch request already
+    went through. Exception handlers are applied the same way the app does.
+    """
+
+    def __init__(self, app: FastAPI):
+        handlers = {}
+        self.error_handler = None
+        for key, handler in app.exception_handlers.items():
+            if key in (500, Exception):
+                self.error_handler = handler
+            else:
+                handlers[key] = handler
+        self.app: ASGIApp = ExceptionMiddleware(
+            AsyncExitStackMiddleware(app.router), handlers=handlers, debug=app.debug
+        )
+
+    async def __call__(self, request: Request, item: BatchRequestItemSchema) -> dict:
+        path, _, query = item.url.partition("?")
+        headers = {
+            key: value
+            for key, value in request.headers.items()
+            if key in FORWARDED_HEADERS
+        }
+        headers.update({key.lower(): value for key, value in item.headers.items()})
+        headers["accept"] = JSON_MEDIA_TYPE
+        body = b"" if item.body is None else orjson.dumps(item.body)
+        if body:
+            headers["content-type"] = JSON_MEDIA_TYPE
+            headers["content-length"] = str(len(body))
+
+        scope = {
+            "type": "http",
+            "asgi": request.scope.get("asgi", {"version": "3.0"}),
+            "http_version": request.scope.get("http_version", "1.1"),
+            "method": item.method,
+            "scheme": request.scope.get("scheme", "http"),
+            "server": request.scope.get("server"),
+            "client": request.scope.get("client"),
+            "root_path": request.scope.get("root_path", ""),
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": [
+                (key.encode("latin-1"), value.encode("latin-1"))
+                for key, value in headers.items()
+            ],
+            "app": request.app,
+        }
+
+        request_sent = False
+        response_start: Message = {"status": 500, "headers": []}
+        chunks = []
+
+        async def receive() -> Message:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # sub-requests never disconnect, wait until the response is done
+            await asyncio.Future()
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception as exc:
+            logger.exception(f"batch sub-request {item.method} {path} failed")
+            chunks.clear()
+            if self.error_handler is None:
+                raise
+            response = await self.error_handler(Request(scope), exc)
+            await response(scope, receive, send)
+
+        return self.format_response(response_start, b"".join(chunks))
+
+    @staticmethod
+    def format_response(response_start: Message, body: bytes) -> dict:
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in response_start["headers"]
+        }
+        content: typing.Any = None
+        if body:
+            if headers.get("content-type", "").startswith(JSON_MEDIA_TYPE):
+                content = orjson.loads(body)
+            else:
+                content = body.decode(errors="replace")
+        return {"status": response_start["status"], "headers": headers, "body": content}
+
+
+def get_dispatcher(request: Request) -> BatchDispatcher:
+    state = request.app.state
+    if getattr(state, "batch_dispatcher", None) is None:
+        state.batch_dispatcher = BatchDispatcher(request.app)
+    return state.batch_dispatcher
+
+
+@router.post("/batch", response_model=BatchResponseSchema)
+async def batch(
+    payload: BatchRequestSchema,
+    request: Request,
+    user=Depends(current_optional_user),
+    dispatcher: BatchDispatcher = Depends(get_dispatcher),
+):
+    """
+    Run several API requests in one round trip, responses keep the input order
+    """
+    if len(payload.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_REQUESTS} requests per batch.",
+        )
+    if any(item.url.partition("?")[0] == request.url.path for item in payload.requests):
+        raise HTTPException(status_code=400, detail="Batches can't be nested.")
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    shared_users = None
+    if user is not None and scheme.lower() == "bearer" and token:
+        shared_users = {token: user}
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def run(item: BatchRequestItemSchema) -> dict:
+        # every sub-request runs in its own task, so these stay task-local
+        response_media_type.set(JSON_MEDIA_TYPE)
+        # a sub-request's route deadline must not cancel the whole batch
+        deadline_watch.set(None)
+        if shared_users and item.method in SAFE_METHODS:
+            if "authorization" not in {key.lower() for key in item.headers}:
+                resolved_users.set(shared_users)
+        async with semaphore:
+            return await dispatcher(request, item)
+
+    responses = await asyncio.gather(*(run(item) for item in payload.requests))
+    return {"responses": responses}
@@ -0,0 +1,41 @@
+import asyncio
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, status
+
+from api.v1.auth.deps import get_strategy_context, get_user_manager_context
+from core.logging import logger
+from core.websocket import websocket_registry
+
+router = APIRouter()
+
+
+@router.websocket("/ws")
+async def events(websocket: WebSocket, token: str = Query(...)):
+    """
+    User scoped event stream, authenticated with the same JWT as the API.
+    The token goes in the query string since browsers can't set headers here.
+    """
+    async with get_strategy_context() as strategy:
+        async with get_user_manager_context() as user_manager:
+            user = await strategy.read_token(token, user_manager)
+    if user is None or not user.is_active:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    connection = websocket_registry.connect(websocket, str(user.id))
+    sender = asyncio.create_task(connection.sender())
+    logger.debug(
+        f"websocket connected for user {user.id}",
+        extra={"extra": {"redis_websocket_key": websocket_registry.channel}},
+    )
+    try:
+        # clients only send keep-alives, anything else is ignored
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        websocket_registry.disconnect(connection)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
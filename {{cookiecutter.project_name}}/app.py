@@ -1,21 +1,96 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.responses import ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
 from starlette_context import plugins
 from starlette_context.middleware import RawContextMiddleware
 
 from api import admin_router, api_router_v1, health_router, root_router
+from api.admin import admin
+from api.root import templates
 from core.config import settings
+from core.db_client import cleanup_db_engine, warm_db_pool
+from core.diagnostics import diagnostics
+from core.drain import drain
 from core.exceptions import error_responses, setup_exception_handlers
-from core.middleware import URLPlugin
+from core.invalidation import invalidation_bus
+from core.logging import logger
+from core.middleware import (
+    CompressionMiddleware,
+    DeadlineMiddleware,
+    DrainMiddleware,
+    MessagePackMiddleware,
+    ProfilingMiddleware,
+    QueryBudgetMiddleware,
+    SessionReleaseMiddleware,
+    TraceRequestIdPlugin,
+    TracingMiddleware,
+    URLPlugin,
+)
+from core.near_cache import near_cache
+from core.profiling import profiles
+from core.redis_client import cleanup_cache_pool, warm_cache_pool
+from core.responses import NegotiatedResponse
+from core.tracing import tracer
+from core.websocket import websocket_registry
+from models.user import warm_up_queries
+
+
+async def warm_up() -> None:
+    """
+    Open the pools, prepare the hot queries and compile the templates, so the
+    first requests of a new worker don't pay for it
+    """
+    await asyncio.gather(
+        warm_db_pool(settings.DATABASE_WARM_CONNECTIONS, warm_up_queries),
+        warm_cache_pool(settings.REDIS_WARM_CONNECTIONS),
+    )
+    templates.get_template("root.html")
+    for name in ("layout.html", "list.html", "details.html", "login.html"):
+        admin.templates.get_template(name)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    await tracer.start()
+    await invalidation_bus.start()
+    await near_cache.start()
+    await websocket_registry.start()
+    await profiles.start()
+    await diagnostics.start()
+    try:
+        await warm_up()
+    except Exception:
+        logger.exception("warm-up failed, connections will open on demand")
+    app.state.ready = True
+    logger.info("worker ready")
+
+    yield
+
+    # the server already waited up to DRAIN_TIMEOUT for requests in flight
+    app.state.ready = False
+    if drain.active:
+        logger.warning(f"shutting down with {drain.active} requests in flight")
+    await diagnostics.stop()
+    await profiles.stop()
+    await websocket_registry.stop()
+    await near_cache.stop()
+    await invalidation_bus.stop()
+    await cleanup_cache_pool()
+    await cleanup_db_engine()
+    await tracer.stop()
+
 
 # Core Application Instance
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.PROJECT_NAME,
     version=settings.API_VERSION,
     openapi_url="/admin/docs/openapi.json",
     redoc_url="/admin/docs",
-    default_response_class=ORJSONResponse,
+    default_response_class=NegotiatedResponse,
     docs_url=None,
     servers=[
         {
@@ -26,12 +101,25 @@ app = FastAPI(
 app.add_middleware(
     RawContextMiddleware,
     plugins=(
-        plugins.RequestIdPlugin(),
+        TraceRequestIdPlugin(),
         plugins.UserAgentPlugin(),
         plugins.ForwardedForPlugin(),
         URLPlugin(),
     ),
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(SessionReleaseMiddleware)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    cached_paths=(app.openapi_url, "/admin/statics"),
+)
+app.add_middleware(MessagePackMiddleware)
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(DrainMiddleware)
 
 # Set all CORS origins enabled
 if settings.BACKEND_CORS_ORIGINS:
@@ -0,0 +1,66 @@
+"""
+Measures the validation error handler for payloads with many invalid fields,
+next to the previous pydantic-wrapped, list-deduplicated implementation.
+
+Usage: python -m benchmarks.error_serialization [iterations]
+"""
+import sys
+import timeit
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError, create_model
+from pydantic.error_wrappers import ErrorWrapper
+
+from core.exceptions import parse_error, validation_exception_handler
+from schemas.error_response import ORJsonResponseSchema, ValidationErrorSchema
+
+FIELD_COUNTS = (1, 10, 100, 1000)
+
+
+def build_exception(field_count: int) -> RequestValidationError:
+    definitions = {f"field_{i}": (int, ...) for i in range(field_count)}
+    model = create_model(f"Payload{field_count}", **definitions)
+    try:
+        model.parse_obj({f"field_{i}": "not a number" for i in range(field_count)})
+    except ValidationError as e:
+        # wrapped the way FastAPI reports an invalid request body
+        return RequestValidationError([ErrorWrapper(e, loc=("body",))])
+
+
+def legacy_validation_response(exc: RequestValidationError) -> ORJSONResponse:
+    fields = []
+    for top_err in exc.raw_errors:
+        for err in top_err.exc.raw_errors:
+            field_err = parse_error(
+                err, field_names=list(map(lambda x: x["name"], fields)), raw=True
+            )
+            if field_err is not None:
+                fields.append(field_err)
+    error = ValidationErrorSchema(
+        code=fields[0]["error_code"], message="Validation error.", fields=fields
+    )
+    response = ORJsonResponseSchema(content=error, status_code=400, headers=None)
+    return ORJSONResponse(**response.dict())
+
+
+def main(iterations: int):
+    for field_count in FIELD_COUNTS:
+        exc = build_exception(field_count)
+        current = timeit.timeit(
+            lambda: validation_exception_handler(None, exc), number=iterations
+        )
+        legacy = timeit.timeit(
+            lambda: legacy_validation_response(exc), number=iterations
+        )
+        print(
+            {
+                "fields": field_count,
+                "current_us": round(current / iterations * 1e6, 1),
+                "legacy_us": round(legacy / iterations * 1e6, 1),
+            }
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,306 @@
+"""
+Load test of the hot endpoints, compared against a stored baseline.
+
+Every scenario is driven twice: in-process through httpx's ASGI transport
+(the app, middleware and core without the network) and over real sockets
+against a uvicorn server in a subprocess. Both use the Postgres and Redis of
+the settings (docker-compose). A superuser ``bench@example.com`` is created
+on the first run.
+
+Throughput and p50/p95/p99 per scenario are written as JSON. With a baseline
+(``--save-baseline`` on a known good commit, on the same machine) scenarios
+whose p95 grew or throughput dropped by more than ``--tolerance`` are listed
+and the exit status is 1. Any unexpected status code fails the run as well,
+and such a run isn't saved as the baseline.
+
+Usage: python -m benchmarks.load [--requests N] [--concurrency N]
+    [--mode asgi|socket|all] [--scenario NAME ...] [--output PATH]
+    [--baseline PATH] [--save-baseline] [--tolerance 0.15]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+import orjson
+
+from core.config import settings
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+API = settings.API_V1_STR
+DIRECTORY = os.path.dirname(__file__)
+
+
+async def login(client: httpx.AsyncClient) -> httpx.Response:
+    return await client.post(
+        f"{API}/auth/login", data={"username": EMAIL, "password": PASSWORD}
+    )
+
+
+async def refresh(client: httpx.AsyncClient, token: str) -> httpx.Response:
+    headers = {"Authorization": f"Bearer {token}"}
+    return await client.post(f"{API}/auth/refresh", headers=headers)
+
+
+# name -> (expected status, request), the request gets the client and a token
+SCENARIOS = {
+    "health": (200, lambda client, token: client.get("/health")),
+    "root": (200, lambda client, token: client.get("/")),
+    "login": (200, lambda client, token: login(client)),
+    "refresh": (200, refresh),
+    "users_me": (
+        200,
+        lambda client, token: client.get(
+            f"{API}/auth/users/me", headers={"Authorization": f"Bearer {token}"}
+        ),
+    ),
+    "user_not_found": (
+        404,
+        lambda client, token: client.get(
+            f"{API}/auth/users/{uuid.uuid4()}",
+            headers={"Authorization": f"Bearer {token}"},
+        ),
+    ),
+    "route_not_found": (404, lambda client, token: client.get("/not-found")),
+    "validation_error": (
+        400,
+        lambda client, token: client.post(
+            f"{API}/auth/register", json={"email": "not-an-email"}
+        ),
+    ),
+    "admin_user_list": (200, lambda client, token: client.get("/admin/user/list")),
+}
+
+
+async def ensure_user() -> None:
+    from fastapi_users.exceptions import UserAlreadyExists
+
+    from api.v1.auth.utils import create_user
+
+    with contextlib.suppress(UserAlreadyExists):
+        await create_user(
+            EMAIL, PASSWORD, "Bench", "User", is_superuser=True, is_verified=True
+        )
+
+
+async def sign_in(client: httpx.AsyncClient) -> str:
+    """
+    Bearer token for the API, the admin session cookie stays in the client
+    """
+    response = await login(client)
+    response.raise_for_status()
+    admin_login = await client.post(
+        "/admin/login", data={"username": EMAIL, "password": PASSWORD}
+    )
+    if admin_login.status_code >= 400:
+        raise RuntimeError(f"admin login failed with {admin_login.status_code}")
+    return response.json()["access_token"]
+
+
+def percentile(quantiles: list, p: int) -> float:
+    return round(quantiles[p - 1] * 1000, 3)
+
+
+async def run_scenario(client, token, name, requests, concurrency) -> dict:
+    expected, request = SCENARIOS[name]
+    # warm up the route (templates, prepared statements, pool)
+    for _ in range(min(10, requests)):
+        await request(client, token)
+
+    latencies, errors = [], 0
+    queue = iter(range(requests))
+
+    async def user():
+        nonlocal errors
+        for _ in queue:
+            started = time.perf_counter()
+            try:
+                response = await request(client, token)
+                ok = response.status_code == expected
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "errors": errors,
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": percentile(quantiles, 50),
+        "p95_ms": percentile(quantiles, 95),
+        "p99_ms": percentile(quantiles, 99),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+async def run_all(client, mode, scenarios, requests, concurrency) -> dict:
+    token = await sign_in(client)
+    results = {}
+    for name in scenarios:
+        result = await run_scenario(client, token, name, requests, concurrency)
+        results[f"{mode}:{name}"] = result
+        print(f"{mode}:{name}", result)
+    return results
+
+
+async def bench_asgi(scenarios, requests, concurrency) -> dict:
+    from app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            return await run_all(client, "asgi", scenarios, requests, concurrency)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        with contextlib.suppress(httpx.HTTPError):
+            if (await client.get("/ready")).status_code == 200:
+                return
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server didn't become ready")
+
+
+async def bench_socket(scenarios, requests, concurrency) -> dict:
+    port = free_port()
+    # a separate process, so the load generator doesn't share its event loop
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            limits=httpx.Limits(max_connections=concurrency),
+            timeout=30,
+        ) as client:
+            await wait_ready(client, server)
+            return await run_all(client, "socket", scenarios, requests, concurrency)
+    finally:
+        server.terminate()
+        server.wait(settings.DRAIN_TIMEOUT + 10)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Scenarios slower or with lower throughput than the baseline allows
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key} p95 {base['p95_ms']} -> {result['p95_ms']}ms")
+        rps, base_rps = result["requests_per_second"], base["requests_per_second"]
+        if rps < base_rps * (1 - tolerance):
+            regressions.append(f"{key} throughput {base_rps} -> {rps}/s")
+    return regressions
+
+
+def revision() -> str:
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    return "unknown"
+
+
+async def main(args) -> int:
+    await ensure_user()
+    scenarios = args.scenario or list(SCENARIOS)
+    results = {}
+    if args.mode in ("asgi", "all"):
+        results.update(await bench_asgi(scenarios, args.requests, args.concurrency))
+    if args.mode in ("socket", "all"):
+        results.update(await bench_socket(scenarios, args.requests, args.concurrency))
+
+    report = {
+        "revision": revision(),
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": results,
+    }
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    print(f"results written to {args.output}")
+
+    # an unexpected status means the numbers measured something else
+    failed = [key for key, result in results.items() if result["errors"]]
+    for key in failed:
+        print(f"ERRORS {key} {results[key]['errors']} unexpected responses")
+    if failed:
+        return 1
+
+    if args.save_baseline:
+        with open(args.baseline, "wb") as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare with, create one with --save-baseline")
+        return 0
+
+    with open(args.baseline, "rb") as f:
+        baseline = orjson.loads(f.read())
+    if baseline["machine"] != report["machine"]:
+        print(f"warning: the baseline was recorded on {baseline['machine']}")
+    regressions = compare(results, baseline["scenarios"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"compared with the baseline of {baseline['revision']}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mode", choices=("asgi", "socket", "all"), default="all")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    parser.add_argument(
+        "--output", default=os.path.join(DIRECTORY, "load_results.json")
+    )
+    parser.add_argument("--baseline", default=os.path.join(DIRECTORY, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,73 @@
+"""
+Compares orjson and MessagePack encode/decode time and size on payloads shaped
+like the API responses (user lists, validation errors, health checks).
+
+Usage: python -m benchmarks.msgpack_vs_orjson [iterations]
+"""
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+import orjson
+
+from core.responses import msgpack_dumps, msgpack_loads
+
+
+def user(index: int) -> dict:
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "id": str(uuid.uuid4()),
+        "email": f"user{index}@example.com",
+        "first_name": "First",
+        "last_name": "Last",
+        "is_active": True,
+        "is_superuser": False,
+        "is_verified": index % 2 == 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+PAYLOADS = {
+    "health": {"database": True, "cache": True},
+    "user": user(0),
+    "user_list_100": [user(i) for i in range(100)],
+    "validation_error_50": {
+        "code": 400,
+        "message": "Validation error.",
+        "fields": [
+            {
+                "name": f"field_{i}",
+                "message": "Value is not a valid integer.",
+                "error_code": 400,
+            }
+            for i in range(50)
+        ],
+    },
+}
+
+
+def main(iterations: int):
+    for name, payload in PAYLOADS.items():
+        json_body = orjson.dumps(payload)
+        msgpack_body = msgpack_dumps(payload)
+        timings = {
+            "orjson_dumps": lambda: orjson.dumps(payload),
+            "msgpack_dumps": lambda: msgpack_dumps(payload),
+            "orjson_loads": lambda: orjson.loads(json_body),
+            "msgpack_loads": lambda: msgpack_loads(msgpack_body),
+        }
+        result = {
+            "payload": name,
+            "orjson_bytes": len(json_body),
+            "msgpack_bytes": len(msgpack_body),
+        }
+        for label, func in timings.items():
+            elapsed = timeit.timeit(func, number=iterations)
+            result[f"{label}_us"] = round(elapsed / iterations * 1e6, 2)
+        print(result)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
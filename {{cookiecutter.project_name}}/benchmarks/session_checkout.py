@@ -0,0 +1,112 @@
+"""
+Compares pool usage of a session held for the whole request (the connection
+checked out up front and returned after the response was sent) with the lazy
+session released after the last DB use.
+
+The workload mixes requests which never touch the DB (cache hits, validation
+errors) with requests running one short query followed by non-DB work
+(serialization, sending the response). The pool is deliberately small, so
+connection demand shows up as checkout wait.
+
+Usage: python -m benchmarks.session_checkout [requests] [concurrency] [pool_size]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.config import settings
+from core.db_client import RequestSession
+
+DB_SHARE = 0.5  # requests which run a query, the rest never touches the DB
+QUERY = text("SELECT pg_sleep(0.002)")
+AFTER_DB_WORK = 0.01  # seconds of serialization / sending after the last query
+
+
+class PoolStats:
+    def __init__(self):
+        self.in_use = 0
+        self.peak = 0
+        self.waits = []
+
+    def checkout(self, *args):
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+
+    def checkin(self, *args):
+        self.in_use -= 1
+
+
+async def eager_request(factory, stats: PoolStats, uses_db: bool) -> None:
+    async with factory() as session:
+        started = time.perf_counter()
+        await session.connection()
+        stats.waits.append(time.perf_counter() - started)
+        if uses_db:
+            await session.execute(QUERY)
+        await asyncio.sleep(AFTER_DB_WORK)
+
+
+async def lazy_request(factory, stats: PoolStats, uses_db: bool) -> None:
+    async with factory() as session:
+        if uses_db:
+            started = time.perf_counter()
+            await session.connection()
+            stats.waits.append(time.perf_counter() - started)
+            await session.execute(QUERY)
+            await session.release()
+        await asyncio.sleep(AFTER_DB_WORK)
+
+
+async def bench(name, handler, requests: int, concurrency: int, pool_size: int):
+    engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL, pool_size=pool_size, max_overflow=0
+    )
+    factory = async_sessionmaker(engine, class_=RequestSession)
+    stats = PoolStats()
+    event.listen(engine.sync_engine.pool, "checkout", stats.checkout)
+    event.listen(engine.sync_engine.pool, "checkin", stats.checkin)
+
+    # open the pool first, connecting isn't what is measured
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    random.seed(0)
+    workload = [random.random() < DB_SHARE for _ in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(uses_db: bool):
+        async with semaphore:
+            await handler(factory, stats, uses_db)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(uses_db) for uses_db in workload))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    waits = sorted(stats.waits)
+    return {
+        "session": name,
+        "requests": requests,
+        "checkouts": len(waits),
+        "peak_connections": stats.peak,
+        "checkout_wait_mean_ms": round(statistics.fmean(waits) * 1000, 3),
+        "checkout_wait_p99_ms": round(waits[int(len(waits) * 0.99)] * 1000, 3),
+        "requests_per_second": round(requests / elapsed),
+    }
+
+
+async def main(requests: int, concurrency: int, pool_size: int):
+    for name, handler in (("eager", eager_request), ("lazy", lazy_request)):
+        print(await bench(name, handler, requests, concurrency, pool_size))
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    pool_size = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    asyncio.run(main(requests, concurrency, pool_size))
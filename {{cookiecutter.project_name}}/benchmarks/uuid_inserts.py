@@ -0,0 +1,62 @@
+"""
+Compares insert throughput and primary key index size for random (v4) and
+time-ordered (v7) UUID keys.
+
+Usage: python -m benchmarks.uuid_inserts [rows] [batch_size]
+"""
+import asyncio
+import sys
+import time
+import uuid
+
+from sqlalchemy import text
+
+from core import engine
+from models.base import uuid7
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+async def bench(name: str, generator, rows: int, batch_size: int) -> dict:
+    table = f"bench_{name}"
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await conn.execute(
+            text(f"CREATE TABLE {table} (id uuid PRIMARY KEY, payload text NOT NULL)")
+        )
+
+    insert = text(f"INSERT INTO {table} (id, payload) VALUES (:id, :payload)")
+    started = time.perf_counter()
+    for offset in range(0, rows, batch_size):
+        batch = [
+            {"id": generator(), "payload": "x" * 32}
+            for _ in range(min(batch_size, rows - offset))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert, batch)
+    elapsed = time.perf_counter() - started
+
+    async with engine.begin() as conn:
+        index_size = await conn.scalar(text(f"SELECT pg_relation_size('{table}_pkey')"))
+        await conn.execute(text(f"DROP TABLE {table}"))
+
+    return {
+        "generator": name,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed),
+        "pk_index_bytes": index_size,
+    }
+
+
+async def main(rows: int, batch_size: int):
+    for name, generator in GENERATORS.items():
+        result = await bench(name, generator, rows, batch_size)
+        print(result)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    asyncio.run(main(rows, batch_size))
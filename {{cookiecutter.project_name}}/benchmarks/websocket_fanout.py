@@ -0,0 +1,80 @@
+"""
+Measures the per-worker WebSocket fan-out: memory per registered connection
+and messages delivered per second through the bounded send queues.
+Sockets are in-process fakes, so this isolates the registry from the network.
+
+Usage: python -m benchmarks.websocket_fanout [connections] [messages]
+"""
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+
+from core.websocket import ConnectionRegistry
+
+
+class FakeWebSocket:
+    def __init__(self, counter: list):
+        self.counter = counter
+
+    async def send_text(self, message: str):
+        self.counter[0] += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def main(connection_count: int, message_count: int):
+    registry = ConnectionRegistry("bench", queue_size=100, max_dropped=10**9)
+    delivered = [0]
+    users = [str(i) for i in range(connection_count // 2 or 1)]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    senders = []
+    for i in range(connection_count):
+        connection = registry.connect(FakeWebSocket(delivered), users[i % len(users)])
+        senders.append(asyncio.create_task(connection.sender()))
+    await asyncio.sleep(0)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    connect_seconds = time.perf_counter() - started
+
+    message = '{"event": "ping", "payload": "' + "x" * 100 + '"}'
+    started = time.perf_counter()
+    expected = 0
+    for i in range(message_count):
+        expected += registry.dispatch(random.choice(users), message)
+        if i % 100 == 0:
+            # let the sender tasks drain the queues
+            await asyncio.sleep(0)
+    while delivered[0] < expected:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    for sender in senders:
+        sender.cancel()
+    await asyncio.gather(*senders, return_exceptions=True)
+
+    print(
+        {
+            "connections": len(registry),
+            "connect_seconds": round(connect_seconds, 3),
+            "bytes_per_connection": memory // connection_count,
+            "messages": message_count,
+            "delivered": delivered[0],
+            "dropped": sum(
+                connection.dropped
+                for connections in registry.connections.values()
+                for connection in connections
+            ),
+            "deliveries_per_second": round(delivered[0] / elapsed),
+        }
+    )
+
+
+if __name__ == "__main__":
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    asyncio.run(main(connections, messages))
@@ -1,3 +1,11 @@
 from .config import settings  # noqa
-from .db_client import Database, engine, get_db, get_db_context  # noqa
-from .redis_client import get_cache_context  # noqa
+from .db_client import (  # noqa
+    Database,
+    RequestSession,
+    engine,
+    get_db,
+    get_db_context,
+    session_factory,
+)
+from .loader import Loaders, RequestLoaders  # noqa
+from .redis_client import get_cache_context, get_replica_context  # noqa
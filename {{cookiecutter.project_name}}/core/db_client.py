@@ -1,16 +1,59 @@
+import asyncio
 import typing
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
 
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session
 
 from core.config import settings
+from core.deadline import remaining
+from core.query_budget import setup_query_counting
+from core.slow_queries import slow_query_log
+from core.tracing import setup_tracing
 
 engine: typing.Optional[AsyncEngine] = create_async_engine(
     settings.ASYNC_DATABASE_URL,
     connect_args=settings.DATABASE_CONNECT_ARGS,
     pool_pre_ping=True,
 )
+slow_query_log.setup(engine)
+setup_query_counting(engine)
+setup_tracing(engine)
+
+
+@event.listens_for(Session, "after_begin")
+def apply_statement_timeout(session: Session, transaction, connection) -> None:
+    # bound every statement of the transaction by the request deadline
+    timeout = remaining()
+    if timeout is not None:
+        statement_timeout = max(int(timeout * 1000), 1)
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {statement_timeout}")
+
+
+async def warm_db_pool(
+    size: int,
+    *queries: typing.Callable[[AsyncSession], typing.Awaitable[typing.Any]],
+) -> None:
+    """
+    Open ``size`` pool connections ahead of traffic and run the hot queries on
+    each, so they are compiled once and prepared on every connection
+    """
+    async with AsyncExitStack() as stack:
+        connections = await asyncio.gather(
+            *(stack.enter_async_context(engine.connect()) for _ in range(size))
+        )
+        for connection in connections:
+            async with AsyncSession(bind=connection) as session:
+                for query in queries:
+                    await query(session)
 
 
 async def cleanup_db_engine():
@@ -19,8 +62,45 @@ async def cleanup_db_engine():
         await engine.dispose()
 
 
-async def get_db() -> typing.AsyncIterable[AsyncSession]:
-    async with AsyncSession(bind=engine) as session:
+class RequestSession(AsyncSession):
+    """
+    Session checking out a connection only when the first statement runs
+    (like every AsyncSession) and able to hand it back before the request ends
+    """
+
+    async def release(self) -> None:
+        """
+        Return the connection to the pool after the last DB use of a handler,
+        e.g. before slow non-DB work. Uncommitted work is rolled back and the
+        loaded objects are detached, but keep their loaded attributes. Using
+        the session again checks out a new connection.
+        """
+        await self.close()
+
+
+# objects stay usable after commit, server defaults come back via RETURNING
+session_factory = async_sessionmaker(
+    engine, class_=RequestSession, expire_on_commit=False
+)
+
+# sessions of the current request, released by SessionReleaseMiddleware as soon
+# as the response starts instead of after it was sent (dependency teardown)
+request_sessions: ContextVar[typing.Optional[typing.List[RequestSession]]] = ContextVar(
+    "request_sessions", default=None
+)
+
+
+async def release_request_sessions() -> None:
+    sessions = request_sessions.get()
+    while sessions:
+        await sessions.pop().release()
+
+
+async def get_db() -> typing.AsyncIterable[RequestSession]:
+    async with session_factory() as session:
+        sessions = request_sessions.get()
+        if sessions is not None:
+            sessions.append(session)
         try:
             yield session
         except Exception:
@@ -31,4 +111,4 @@ async def get_db() -> typing.AsyncIterable[AsyncSession]:
 get_db_context = asynccontextmanager(get_db)
 
 # reusable fastapi dependency
-Database = typing.Annotated[AsyncSession, Depends(get_db)]
+Database = typing.Annotated[RequestSession, Depends(get_db)]
@@ -0,0 +1,105 @@
+import asyncio
+import math
+import typing
+from contextvars import ContextVar
+
+from core.config import settings
+
+# absolute deadline of the current request, in event loop time
+deadline: ContextVar[typing.Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineWatch:
+    """
+    Deadline ``DeadlineMiddleware`` enforces, moved by ``tighten`` from within
+    the request's task
+    """
+
+    def __init__(self, at: typing.Optional[float]):
+        self.at = at
+        self._moved = asyncio.get_running_loop().create_future()
+
+    def move(self, at: float) -> None:
+        self.at = at
+        if not self._moved.done():
+            self._moved.set_result(None)
+
+    async def wait(self, task: asyncio.Task) -> bool:
+        """
+        Wait for the task until the deadline, re-armed whenever it moves
+
+        :return: False when the deadline passed first
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            timeout = None if self.at is None else max(self.at - loop.time(), 0)
+            done, _ = await asyncio.wait(
+                {task, self._moved},
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if task in done:
+                return True
+            if not done:
+                return False
+            self._moved = loop.create_future()
+
+
+# watch of the current request, None where nothing cancels the handler
+deadline_watch: ContextVar[typing.Optional[DeadlineWatch]] = ContextVar(
+    "deadline_watch", default=None
+)
+
+
+def remaining() -> typing.Optional[float]:
+    """
+    Seconds left until the deadline of the current request, None without one
+    """
+    value = deadline.get()
+    if value is None:
+        return None
+    return max(value - asyncio.get_running_loop().time(), 0.0)
+
+
+def tighten(seconds: float) -> None:
+    """
+    Move the deadline closer, a later deadline never replaces an earlier one
+    """
+    value = asyncio.get_running_loop().time() + seconds
+    current = deadline.get()
+    if current is None or value < current:
+        deadline.set(value)
+        watch = deadline_watch.get()
+        if watch is not None:
+            watch.move(value)
+
+
+def parse_timeout(value: typing.Optional[str]) -> typing.Optional[float]:
+    """
+    Timeout of the request: the header (in seconds) or the default, capped;
+    the header can't lift the deadline, invalid values fall back to the default
+    """
+    timeout = settings.REQUEST_DEFAULT_TIMEOUT
+    if value:
+        try:
+            requested = float(value)
+        except ValueError:
+            requested = math.nan
+        if math.isfinite(requested) and requested > 0:
+            timeout = requested
+    if timeout is None or timeout <= 0:
+        return None
+    return min(timeout, settings.REQUEST_MAX_TIMEOUT)
+
+
+def route_deadline(seconds: float):
+    """
+    Per route default, e.g. ``dependencies=[Depends(route_deadline(2))]``;
+    bounds DB and Redis calls and cancels the handler like the request deadline
+    (in batch sub-requests only the calls)
+    """
+
+    async def dependency() -> None:
+        tighten(seconds)
+
+    return dependency
@@ -0,0 +1,229 @@
+import asyncio
+import gc
+import os
+import random
+import resource
+import signal
+import socket
+import time
+import tracemalloc
+import typing
+from collections import Counter
+
+import orjson
+
+from core.config import settings
+from core.invalidation import invalidation_bus
+from core.logging import logger
+from core.redis_client import get_cache_context
+
+NAMESPACE = "diagnostics"
+COMMANDS = ("tracemalloc-start", "tracemalloc-snapshot", "tracemalloc-stop", "types")
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size, the peak where /proc isn't available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def gc_stats() -> typing.List[dict]:
+    counts = gc.get_count()
+    thresholds = gc.get_threshold()
+    return [
+        {
+            "generation": generation,
+            "count": counts[generation],
+            "threshold": thresholds[generation],
+            **stats,
+        }
+        for generation, stats in enumerate(gc.get_stats())
+    ]
+
+
+def type_counts(limit: int = 30) -> dict:
+    objects = gc.get_objects()
+    counter = Counter(
+        f"{type(obj).__module__}.{type(obj).__qualname__}" for obj in objects
+    )
+    return {"objects": len(objects), "top": counter.most_common(limit)}
+
+
+class WorkerDiagnostics:
+    """
+    Memory report of this worker, published to Redis for the admin
+
+    Every ``DIAGNOSTICS_INTERVAL`` the worker writes its RSS, GC stats and,
+    while tracemalloc runs, the allocations grown since the last snapshot into
+    the ``workers`` hash. The admin sends commands (see ``COMMANDS``) to a
+    specific worker over the invalidation bus. Above ``DIAGNOSTICS_RSS_LIMIT``
+    the worker asks to be replaced: under gunicorn SIGTERM drains the uvicorn
+    worker and the arbiter starts a fresh one.
+    """
+
+    def __init__(
+        self,
+        prefix: str = settings.DIAGNOSTICS_PREFIX,
+        interval: int = settings.DIAGNOSTICS_INTERVAL,
+        rss_limit: typing.Optional[int] = settings.DIAGNOSTICS_RSS_LIMIT,
+    ):
+        self.workers_key = f"{prefix}:workers"
+        self.interval = interval
+        self.rss_limit = rss_limit * 1024 * 1024 if rss_limit else None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.started_at = time.time()
+        self.baseline: typing.Optional[tracemalloc.Snapshot] = None
+        self.type_counts: typing.Optional[dict] = None
+        self.recycling = False
+        self._commands: typing.List[str] = []
+        self._task: typing.Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    async def start(self) -> None:
+        invalidation_bus.register(NAMESPACE, self.handle_commands)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            async with get_cache_context() as redis:
+                await redis.hdel(self.workers_key, self.worker_id)
+        except Exception:
+            logger.warning("removing the worker diagnostics failed")
+
+    async def command(self, worker_id: str, command: str) -> None:
+        if command not in COMMANDS:
+            raise ValueError(f"Unknown diagnostics command {command}")
+        await invalidation_bus.publish(NAMESPACE, [f"{worker_id} {command}"])
+
+    def handle_commands(self, keys: typing.Optional[typing.List[str]]) -> None:
+        for key in keys or ():
+            worker_id, _, command = key.rpartition(" ")
+            if worker_id == self.worker_id:
+                self.execute(command)
+
+    def execute(self, command: str) -> None:
+        # runs in the bus listener, snapshots and gc walks are left to _run
+        self._commands.append(command)
+        # publish the outcome right away instead of on the next tick
+        self._wakeup.set()
+
+    def apply(self, command: str) -> None:
+        logger.info(f"diagnostics command {command}")
+        if command == "tracemalloc-start":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(settings.DIAGNOSTICS_TRACEMALLOC_FRAMES)
+            self.baseline = tracemalloc.take_snapshot()
+        elif command == "tracemalloc-snapshot" and tracemalloc.is_tracing():
+            self.baseline = tracemalloc.take_snapshot()
+        elif command == "tracemalloc-stop":
+            tracemalloc.stop()
+            self.baseline = None
+        elif command == "types":
+            self.type_counts = type_counts()
+
+    def tracemalloc_report(self, limit: int = 20) -> typing.Optional[dict]:
+        if not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        report = {"current": current, "peak": peak, "growth": []}
+        if self.baseline is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),)
+            )
+            for stat in snapshot.compare_to(self.baseline, "lineno")[:limit]:
+                report["growth"].append(
+                    {
+                        "location": str(stat.traceback),
+                        "size_diff": stat.size_diff,
+                        "size": stat.size,
+                        "count_diff": stat.count_diff,
+                    }
+                )
+        return report
+
+    def report(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "pid": os.getpid(),
+            "rss": rss_bytes(),
+            "rss_limit": self.rss_limit,
+            "uptime": time.time() - self.started_at,
+            "updated_at": time.time(),
+            "gc": gc_stats(),
+            "types": self.type_counts,
+            "tracemalloc": self.tracemalloc_report(),
+            "recycling": self.recycling,
+        }
+
+    async def publish(self) -> dict:
+        # snapshot comparison walks every traced block, keep it off the loop
+        report = await asyncio.to_thread(self.report)
+        async with get_cache_context() as redis:
+            await redis.hset(self.workers_key, self.worker_id, orjson.dumps(report))
+        return report
+
+    async def workers(self) -> typing.List[dict]:
+        """
+        Reports of all workers, dropping the ones which stopped reporting
+        """
+        async with get_cache_context() as redis:
+            raw = await redis.hgetall(self.workers_key)
+            reports, stale = [], []
+            for worker_id, value in raw.items():
+                report = orjson.loads(value)
+                if time.time() - report["updated_at"] > self.interval * 3:
+                    stale.append(worker_id)
+                else:
+                    reports.append(report)
+            if stale:
+                await redis.hdel(self.workers_key, *stale)
+        return sorted(reports, key=lambda report: report["worker_id"])
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                commands, self._commands = self._commands, []
+                for command in commands:
+                    await asyncio.to_thread(self.apply, command)
+                report = await self.publish()
+                if self.rss_limit and report["rss"] > self.rss_limit:
+                    await self.recycle(report["rss"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("publishing worker diagnostics failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def recycle(self, rss: int) -> None:
+        if self.recycling:
+            return
+        logger.warning(
+            f"worker RSS {rss // 2**20}MB over the {self.rss_limit // 2**20}MB limit",
+            extra={"extra": {"rss": rss, "rss_limit": self.rss_limit}},
+        )
+        if not settings.PROD:
+            # only gunicorn (see main.py) replaces a worker which exits
+            return
+        self.recycling = True
+        # spread the restarts, workers started together grow together
+        await asyncio.sleep(random.uniform(0, self.interval))
+        logger.warning("recycling the worker")
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+diagnostics = WorkerDiagnostics()
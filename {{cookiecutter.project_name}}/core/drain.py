@@ -0,0 +1,25 @@
+class Drain:
+    """
+    Requests in flight of a worker which is shutting down
+
+    ``start`` runs from the SIGTERM/SIGINT handler of the server (see
+    ``core.server``), before the server stops accepting connections. From then
+    on ``DrainMiddleware`` turns new requests away and ``/ready`` fails, while
+    the server waits up to ``DRAIN_TIMEOUT`` for the running ones.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.draining = False
+
+    def enter(self) -> None:
+        self.active += 1
+
+    def exit(self) -> None:
+        self.active -= 1
+
+    def start(self) -> None:
+        self.draining = True
+
+
+drain = Drain()
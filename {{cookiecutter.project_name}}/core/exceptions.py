@@ -1,18 +1,23 @@
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, Container, Dict, List, Optional
 
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import ORJSONResponse
 from pydantic import EnumError, StrRegexError
 from starlette.exceptions import HTTPException
 from starlette.requests import Request
+from starlette.responses import Response
 
+from core.responses import (
+    NegotiatedResponse,
+    negotiate_media_type,
+    prerender,
+    prerendered_response,
+)
 from schemas.error_response import (
     AuthenticationErrorSchema,
     AuthorizationErrorSchema,
     InternalErrorSchema,
     NotFoundErrorSchema,
-    ORJsonResponseSchema,
     ValidationErrorSchema,
 )
 
@@ -24,13 +29,33 @@ error_responses = {
     500: {"model": InternalErrorSchema},
 }
 
+# static error bodies are serialized only once, for every supported media type
+NOT_FOUND_BODIES = prerender(NotFoundErrorSchema().dict())
+INTERNAL_ERROR_BODIES = prerender(InternalErrorSchema().dict())
+
+
+def error_response(
+    content: dict, status_code: int, headers: Optional[Dict] = None
+) -> Response:
+    """
+    Build the error response from a plain dict, in the negotiated media type
+
+    :param content: dict with code/message/fields
+    :param status_code: HTTP status code of the response
+    :param headers: Optional headers of the response
+    :return: Response with the JSON (or MessagePack) error body
+    """
+    return NegotiatedResponse(content, status_code=status_code, headers=headers)
+
 
-def parse_error(err: Any, field_names: List, raw: bool = True) -> Optional[dict]:
+def parse_error(
+    err: Any, field_names: Container[str], raw: bool = True
+) -> Optional[dict]:
     """
     Parse single error object (such as pydantic-based or fastapi-based) to dict
 
     :param err: Error object
-    :param field_names: List of names of the field that are already processed
+    :param field_names: Names of the fields that are already processed
     :param raw: Whether this is a raw error or wrapped pydantic error
     :return: dict with name of the field (or "__all__") and actual message
     """
@@ -52,33 +77,30 @@ def parse_error(err: Any, field_names: List, raw: bool = True) -> Optional[dict]
         # default error code for non-custom errors is 400
         error_code = 400
 
+    loc = err.loc_tuple()
     if not raw:
-        if len(err.loc_tuple()) == 2:
-            if str(err.loc_tuple()[0]) in ["body", "query"]:
-                name = err.loc_tuple()[1]
+        if len(loc) == 2:
+            if str(loc[0]) in ["body", "query"]:
+                name = loc[1]
             else:
-                name = err.loc_tuple()[0]
-        elif len(err.loc_tuple()) == 1:
-            if str(err.loc_tuple()[0]) == "body":
+                name = loc[0]
+        elif len(loc) == 1:
+            if str(loc[0]) == "body":
                 name = "__all__"
             else:
-                name = str(err.loc_tuple()[0])
+                name = str(loc[0])
         else:
             name = "__all__"
     else:
-        if len(err.loc_tuple()) == 2:
-            name = str(err.loc_tuple()[0])
-        elif len(err.loc_tuple()) == 1:
-            name = str(err.loc_tuple()[0])
+        if len(loc) in (1, 2):
+            name = str(loc[0])
         else:
             name = "__all__"
 
     if name in field_names:
         return None
 
-    if message and not any(
-        [message.endswith("."), message.endswith("?"), message.endswith("!")]
-    ):
+    if message and not message.endswith((".", "?", "!")):
         message = message + "."
     message = message.capitalize()
 
@@ -93,6 +115,7 @@ def raw_errors_to_fields(raw_errors: List) -> List[dict]:
     :return: List of dicts (1 dict for every raw error)
     """
     fields = []
+    field_names = set()
     for top_err in raw_errors:
         if hasattr(top_err.exc, "raw_errors"):
             for err in top_err.exc.raw_errors:
@@ -100,27 +123,19 @@ def raw_errors_to_fields(raw_errors: List) -> List[dict]:
                 # handling & internal validation
                 if isinstance(err, list):
                     err = err[0]
-                field_err = parse_error(
-                    err,
-                    field_names=list(map(lambda x: x["name"], fields)),
-                    raw=True,
-                )
+                field_err = parse_error(err, field_names=field_names, raw=True)
                 if field_err is not None:
                     fields.append(field_err)
+                    field_names.add(field_err["name"])
         else:
-            field_err = parse_error(
-                top_err,
-                field_names=list(map(lambda x: x["name"], fields)),
-                raw=False,
-            )
+            field_err = parse_error(top_err, field_names=field_names, raw=False)
             if field_err is not None:
                 fields.append(field_err)
+                field_names.add(field_err["name"])
     return fields
 
 
-def http_exception_handler(
-    request: Request, exc: HTTPException
-) -> ORJsonResponseSchema:
+def http_exception_handler(request: Request, exc: HTTPException) -> Response:
     """
     Handles StarletteHTTPException, translating it into flat dict error data:
         * code - unique code of the error in the system
@@ -136,53 +151,52 @@ def http_exception_handler(
     headers = getattr(exc, "headers", None)
 
     code = getattr(exc, "error_code", exc.status_code)
-    error = ValidationErrorSchema(code=code, message=message, fields=fields)
+    error = {"code": code, "message": message, "fields": fields}
 
-    return ORJsonResponseSchema(
-        content=error, status_code=exc.status_code, headers=headers
-    )
+    return error_response(error, status_code=exc.status_code, headers=headers)
 
 
 def validation_exception_handler(
     request: Request, exc: RequestValidationError
-) -> ORJsonResponseSchema:
+) -> Response:
     status_code = getattr(exc, "status_code", 400)
     headers = getattr(exc, "headers", None)
     fields = raw_errors_to_fields(exc.raw_errors)
 
     if fields:
-        code = list(set(list(map(lambda x: x["error_code"], fields))))[0]
+        code = fields[0]["error_code"]
     else:
         code = getattr(exc, "error_code", status_code)
 
     message = getattr(exc, "message", "Validation error.")
-    if message and not any(
-        [message.endswith("."), message.endswith("?"), message.endswith("!")]
-    ):
+    if message and not message.endswith((".", "?", "!")):
         message = message + "."  # pragma: no cover
 
-    error = ValidationErrorSchema(code=code, message=message, fields=fields)
-    return ORJsonResponseSchema(content=error, headers=headers, status_code=status_code)
+    error = {"code": code, "message": message, "fields": fields}
+    return error_response(error, status_code=status_code, headers=headers)
 
 
-def not_found_error_handler(
-    request: Request, exc: HTTPException
-) -> ORJsonResponseSchema:
+def not_found_error_handler(request: Request, exc: HTTPException) -> Response:
     headers = getattr(exc, "headers", None)
     status_code = getattr(exc, "status_code", 404)
 
-    error = NotFoundErrorSchema()
-    return ORJsonResponseSchema(content=error, status_code=status_code, headers=headers)
+    return prerendered_response(
+        NOT_FOUND_BODIES, status_code=status_code, headers=headers
+    )
 
 
 def internal_server_error_handler(
     request: Request, exc: RequestValidationError
-) -> ORJsonResponseSchema:
-    headers = getattr(exc, "headers", None)
+) -> Response:
+    headers = {**(getattr(exc, "headers", None) or {}), "Vary": "Accept"}
     status_code = getattr(exc, "status_code", 500)
 
-    return ORJsonResponseSchema(
-        content=InternalErrorSchema(), status_code=status_code, headers=headers
+    # runs in ServerErrorMiddleware, outside MessagePackMiddleware, negotiate here
+    return prerendered_response(
+        INTERNAL_ERROR_BODIES,
+        status_code=status_code,
+        headers=headers,
+        media_type=negotiate_media_type(request.headers.get("accept", "")),
     )
 
 
@@ -206,9 +220,8 @@ def setup_exception_handlers(app: FastAPI) -> None:
     def create_response(processor: Callable):
         async def _wrapped(
             request: Request, exc: RequestValidationError, **kwargs
-        ) -> ORJSONResponse:
-            response_arguments = processor(request=request, exc=exc, **kwargs)
-            return ORJSONResponse(**response_arguments.dict())
+        ) -> Response:
+            return processor(request=request, exc=exc, **kwargs)
 
         return _wrapped
 
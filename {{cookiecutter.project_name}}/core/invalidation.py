@@ -0,0 +1,180 @@
+import asyncio
+import typing
+import uuid
+from collections import defaultdict
+
+import orjson
+from redis.exceptions import ConnectionError, TimeoutError
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from core.config import settings
+from core.local_cache import LocalCache
+from core.logging import logger
+from core.redis_client import get_pubsub_context
+from models.base import BaseUUIDModel
+
+Handler = typing.Callable[[typing.Optional[typing.List[str]]], None]
+
+
+class InvalidationBus:
+    """
+    Propagates cache invalidations between workers over Redis pub/sub
+
+    Every worker runs one subscriber (started in the app lifespan). Messages
+    are namespaced, ``keys=None`` means "drop the whole namespace". When the
+    subscription drops, local handlers are flushed since messages published in
+    the meantime are lost.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.connected = False
+        self._handlers: typing.Dict[str, typing.List[Handler]] = defaultdict(list)
+        self._task: typing.Optional[asyncio.Task] = None
+        self._pending: typing.Set[asyncio.Task] = set()
+
+    def register(self, namespace: str, handler: Handler) -> None:
+        self._handlers[namespace].append(handler)
+
+    def register_cache(self, cache: LocalCache) -> LocalCache:
+        self.register(cache.namespace, cache.invalidate)
+        return cache
+
+    def invalidate_local(
+        self, namespace: str, keys: typing.Optional[typing.List[str]] = None
+    ) -> None:
+        for handler in self._handlers.get(namespace, ()):
+            handler(keys)
+
+    def flush_local(self) -> None:
+        for namespace in self._handlers:
+            self.invalidate_local(namespace)
+
+    async def publish(
+        self, namespace: str, keys: typing.Optional[typing.List[str]] = None
+    ) -> None:
+        self.invalidate_local(namespace, keys)
+        message = orjson.dumps(
+            {"origin": self.origin, "namespace": namespace, "keys": keys}
+        )
+        async with get_pubsub_context() as redis:
+            await redis.publish(self.channel, message)
+
+    def publish_soon(
+        self, namespace: str, keys: typing.Optional[typing.List[str]] = None
+    ) -> None:
+        """
+        Fire and forget variant of publish, usable from sync callbacks
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # no event loop, e.g. alembic or scripts
+            self.invalidate_local(namespace, keys)
+            return
+        task = loop.create_task(self.publish(namespace, keys))
+        self._pending.add(task)
+        task.add_done_callback(self._published)
+
+    def _published(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("cache invalidation publish failed", exc_info=task.exception())
+
+    def handle_message(self, data: typing.Union[str, bytes]) -> None:
+        try:
+            message = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            logger.warning("malformed cache invalidation message")
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.invalidate_local(message["namespace"], message.get("keys"))
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def _listen(self) -> None:
+        backoff = 0.5
+        while True:
+            try:
+                async with get_pubsub_context() as redis:
+                    async with redis.pubsub() as pubsub:
+                        await pubsub.subscribe(self.channel)
+                        if not self.connected:
+                            # anything published while we were away is lost
+                            self.flush_local()
+                            self.connected = True
+                        backoff = 0.5
+                        async for message in pubsub.listen():
+                            if message["type"] == "message":
+                                self.handle_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionError, TimeoutError, OSError):
+                logger.warning("cache invalidation subscription lost, flushing")
+            except Exception:
+                logger.exception("cache invalidation subscriber failed, flushing")
+            self.connected = False
+            self.flush_local()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+invalidation_bus = InvalidationBus(settings.CACHE_INVALIDATION_CHANNEL)
+
+
+def _pending_invalidations(session: Session) -> typing.Dict[str, typing.Optional[set]]:
+    return session.info.setdefault("invalidations", {})
+
+
+def _add_invalidation(session: Session, namespace: str, key: typing.Optional[str]):
+    pending = _pending_invalidations(session)
+    if key is None:
+        pending[namespace] = None
+    elif namespace not in pending:
+        pending[namespace] = {key}
+    elif pending[namespace] is not None:
+        pending[namespace].add(key)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session: Session, flush_context) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, BaseUUIDModel):
+            _add_invalidation(session, instance.__tablename__, str(instance.id))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(orm_execute_state: ORMExecuteState) -> None:
+    # ORM enabled update()/delete() statements don't say which rows they touch
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, BaseUUIDModel):
+            _add_invalidation(
+                orm_execute_state.session, mapper.class_.__tablename__, None
+            )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session) -> None:
+    pending = session.info.pop("invalidations", None)
+    if not pending:
+        return
+    for namespace, keys in pending.items():
+        invalidation_bus.publish_soon(namespace, None if keys is None else sorted(keys))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session: Session, previous_transaction) -> None:
+    session.info.pop("invalidations", None)
@@ -0,0 +1,328 @@
+import asyncio
+import random
+import signal
+import time
+import typing
+import uuid
+
+import orjson
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.logging import logger
+from core.redis_client import atomic_pipeline, get_cache_context
+from core.tracing import (
+    SPAN_KIND_CONSUMER,
+    current_span,
+    propagation_headers,
+    start_trace,
+    tracer,
+)
+
+JobFunc = typing.Callable[..., typing.Awaitable[typing.Any]]
+
+# job name -> coroutine function, filled by the @job decorator
+registry: typing.Dict[str, JobFunc] = {}
+
+# moves due jobs from the scheduled sorted set back to the queue, atomically
+PROMOTE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('LPUSH', KEYS[2], id)
+    redis.call('HSET', ARGV[3] .. id, 'status', 'queued')
+end
+return #ids
+"""
+
+
+class JobQueue:
+    """
+    Redis backed job queue
+
+    * ``queue`` list of job ids waiting to run, consumed with BLMOVE into the
+      ``processing`` list so jobs of a crashed worker can be recovered
+    * ``scheduled`` sorted set of delayed jobs and retries, scored by due time
+    * ``dead`` list of jobs which ran out of retries
+    * ``job:<id>`` hash with the job payload and status, expires once finished
+    * ``index`` sorted set of recent job ids, for the admin
+    """
+
+    def __init__(self, prefix: str = settings.JOB_QUEUE_PREFIX):
+        # the hash tag keeps every key in one slot, so the scripts work on a cluster
+        self.prefix = "{" + prefix + "}"
+        self.queue_key = f"{self.prefix}:queue"
+        self.processing_key = f"{self.prefix}:processing"
+        self.scheduled_key = f"{self.prefix}:scheduled"
+        self.dead_key = f"{self.prefix}:dead"
+        self.index_key = f"{self.prefix}:index"
+        self.job_key_prefix = f"{self.prefix}:job:"
+
+    def job_key(self, job_id: str) -> str:
+        return f"{self.job_key_prefix}{job_id}"
+
+    async def enqueue(
+        self,
+        name: str,
+        *args,
+        _delay: float = 0,
+        _max_retries: typing.Optional[int] = None,
+        **kwargs,
+    ) -> str:
+        if name not in registry:
+            raise KeyError(f"Unknown job {name}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        max_retries = settings.JOB_MAX_RETRIES if _max_retries is None else _max_retries
+        async with get_cache_context() as redis:
+            async with atomic_pipeline(redis) as pipe:
+                pipe.hset(
+                    self.job_key(job_id),
+                    mapping={
+                        "id": job_id,
+                        "name": name,
+                        "payload": orjson.dumps({"args": args, "kwargs": kwargs}),
+                        "status": "scheduled" if _delay > 0 else "queued",
+                        "attempts": 0,
+                        "max_retries": max_retries,
+                        "enqueued_at": now,
+                        # the job continues the trace of the enqueuing request
+                        **propagation_headers(),
+                    },
+                )
+                if _delay > 0:
+                    pipe.zadd(self.scheduled_key, {job_id: now + _delay})
+                else:
+                    pipe.lpush(self.queue_key, job_id)
+                pipe.zadd(self.index_key, {job_id: now})
+                pipe.zremrangebyrank(self.index_key, 0, -settings.JOB_INDEX_SIZE - 1)
+                await pipe.execute()
+        return job_id
+
+    async def stats(self, redis: Redis) -> dict:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.llen(self.queue_key)
+            pipe.llen(self.processing_key)
+            pipe.zcard(self.scheduled_key)
+            pipe.llen(self.dead_key)
+            queued, processing, scheduled, dead = await pipe.execute()
+        return {
+            "queued": queued,
+            "processing": processing,
+            "scheduled": scheduled,
+            "dead": dead,
+        }
+
+    async def recent(self, redis: Redis, limit: int = 100) -> typing.List[dict]:
+        job_ids = await redis.zrevrange(self.index_key, 0, limit - 1)
+        async with redis.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.hgetall(self.job_key(job_id))
+            jobs = await pipe.execute()
+        return [job for job in jobs if job]
+
+
+job_queue = JobQueue()
+
+
+def job(func: JobFunc = None, *, name: typing.Optional[str] = None):
+    """
+    Register a coroutine function as a job
+
+    .. code-block:: python
+
+        @job
+        async def send_email(user_id: str): ...
+
+        await send_email.enqueue(str(user.id))
+    """
+
+    def decorator(func: JobFunc) -> JobFunc:
+        job_name = name or f"{func.__module__}.{func.__qualname__}"
+        registry[job_name] = func
+
+        async def enqueue(*args, **kwargs) -> str:
+            return await job_queue.enqueue(job_name, *args, **kwargs)
+
+        func.job_name = job_name
+        func.enqueue = enqueue
+        return func
+
+    return decorator(func) if func is not None else decorator
+
+
+class Worker:
+    """
+    Runs jobs from the queue with bounded concurrency, promotes scheduled jobs
+    and retries failed ones with exponential backoff and jitter. SIGTERM stops
+    consuming and waits for the running jobs.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue = job_queue,
+        concurrency: int = settings.JOB_CONCURRENCY,
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.stopping = asyncio.Event()
+        self.running: typing.Set[asyncio.Task] = set()
+
+    def stop(self) -> None:
+        logger.info("job worker stopping")
+        self.stopping.set()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+
+        logger.info(f"job worker started, jobs: {', '.join(sorted(registry))}")
+        await tracer.start()
+        async with get_cache_context() as redis:
+            scheduler = asyncio.create_task(self.schedule(redis))
+            try:
+                await self.consume(redis)
+            finally:
+                scheduler.cancel()
+                if self.running:
+                    await asyncio.gather(*self.running, return_exceptions=True)
+                await tracer.stop()
+
+    async def consume(self, redis: Redis) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while not self.stopping.is_set():
+            await semaphore.acquire()
+            try:
+                job_id = await redis.blmove(
+                    self.queue.queue_key, self.queue.processing_key, 1, "RIGHT", "LEFT"
+                )
+            except Exception:
+                semaphore.release()
+                logger.exception("job worker can't read the queue")
+                await asyncio.sleep(1)
+                continue
+            if job_id is None:
+                semaphore.release()
+                continue
+
+            task = asyncio.create_task(self.execute(redis, job_id))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+
+    async def schedule(self, redis: Redis) -> None:
+        promote = redis.register_script(PROMOTE_SCRIPT)
+        last_reap = 0.0
+        while True:
+            try:
+                now = time.time()
+                await promote(
+                    keys=[self.queue.scheduled_key, self.queue.queue_key],
+                    args=[now, 100, self.queue.job_key_prefix],
+                )
+                if now - last_reap > settings.JOB_TIMEOUT:
+                    await self.reap(redis, now)
+                    last_reap = now
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("job scheduler failed")
+            await asyncio.sleep(1)
+
+    async def reap(self, redis: Redis, now: float) -> None:
+        """
+        Requeue jobs left in processing by a worker that died mid-job
+        """
+        for job_id in await redis.lrange(self.queue.processing_key, 0, -1):
+            # a worker may die between moving the job and marking it started
+            started_at, enqueued_at = await redis.hmget(
+                self.queue.job_key(job_id), "started_at", "enqueued_at"
+            )
+            since = started_at or enqueued_at
+            if since and now - float(since) > settings.JOB_TIMEOUT * 2:
+                logger.warning(f"requeueing stale job {job_id}")
+                async with atomic_pipeline(redis) as pipe:
+                    pipe.lrem(self.queue.processing_key, 1, job_id)
+                    pipe.lpush(self.queue.queue_key, job_id)
+                    pipe.hset(self.queue.job_key(job_id), "status", "queued")
+                    await pipe.execute()
+
+    async def execute(self, redis: Redis, job_id: str) -> None:
+        job_key = self.queue.job_key(job_id)
+        data = await redis.hgetall(job_key)
+        func = registry.get(data.get("name"))
+        if func is None:
+            logger.error(f"job {job_id} has unknown name {data.get('name')}")
+            await self.bury(redis, job_id, "Unknown job")
+            return
+
+        attempts = await redis.hincrby(job_key, "attempts", 1)
+        await redis.hset(
+            job_key, mapping={"status": "running", "started_at": time.time()}
+        )
+        payload = orjson.loads(data["payload"])
+        root = None
+        if settings.TRACING_ENABLED:
+            root = start_trace(
+                f"job {data['name']}",
+                data.get("traceparent"),
+                SPAN_KIND_CONSUMER,
+                {"job.id": job_id, "job.attempt": attempts},
+            )
+        # without a root, DB and Redis calls of the job don't start spans
+        token = current_span.set(root)
+        try:
+            await asyncio.wait_for(
+                func(*payload["args"], **payload["kwargs"]), settings.JOB_TIMEOUT
+            )
+        except Exception as e:
+            if root is not None:
+                root.set_error(e)
+            error = f"{type(e).__name__}: {e}"
+            if attempts > int(data.get("max_retries", 0)):
+                logger.exception(f"job {data['name']} {job_id} failed, giving up")
+                await self.bury(redis, job_id, error)
+            else:
+                logger.warning(f"job {data['name']} {job_id} failed, retrying: {error}")
+                await self.retry(redis, job_id, attempts, error)
+            return
+        finally:
+            current_span.reset(token)
+            if root is not None:
+                root.finish()
+                tracer.submit(root)
+
+        async with atomic_pipeline(redis) as pipe:
+            pipe.hset(job_key, mapping={"status": "done", "finished_at": time.time()})
+            pipe.hdel(job_key, "error")
+            pipe.expire(job_key, settings.JOB_RESULT_TTL)
+            pipe.lrem(self.queue.processing_key, 1, job_id)
+            await pipe.execute()
+
+    async def retry(self, redis: Redis, job_id: str, attempts: int, error: str):
+        backoff = min(
+            settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1),
+            settings.JOB_RETRY_BACKOFF_MAX,
+        )
+        due = time.time() + backoff * random.uniform(0.5, 1.5)
+        async with atomic_pipeline(redis) as pipe:
+            pipe.hset(
+                self.queue.job_key(job_id),
+                mapping={"status": "retrying", "error": error},
+            )
+            pipe.zadd(self.queue.scheduled_key, {job_id: due})
+            pipe.lrem(self.queue.processing_key, 1, job_id)
+            await pipe.execute()
+
+    async def bury(self, redis: Redis, job_id: str, error: str) -> None:
+        async with atomic_pipeline(redis) as pipe:
+            pipe.hset(
+                self.queue.job_key(job_id),
+                mapping={"status": "dead", "error": error, "finished_at": time.time()},
+            )
+            pipe.expire(self.queue.job_key(job_id), settings.JOB_RESULT_TTL * 7)
+            pipe.lpush(self.queue.dead_key, job_id)
+            pipe.ltrim(self.queue.dead_key, 0, settings.JOB_INDEX_SIZE - 1)
+            pipe.lrem(self.queue.processing_key, 1, job_id)
+            await pipe.execute()
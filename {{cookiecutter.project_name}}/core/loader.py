@@ -0,0 +1,113 @@
+import asyncio
+import typing
+import uuid
+
+from fastapi import Depends
+from sqlalchemy import Uuid, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db_client import get_db
+
+if typing.TYPE_CHECKING:
+    from models.base import BaseUUIDModel
+
+ModelT = typing.TypeVar("ModelT", bound="BaseUUIDModel")
+
+
+class ModelLoader(typing.Generic[ModelT]):
+    """
+    Request scoped loader coalescing ``load`` calls made within the same
+    event loop tick into one ``WHERE id = ANY(:ids)`` query. Results (including
+    misses) are memoized for the lifetime of the loader.
+    """
+
+    def __init__(self, session: AsyncSession, model: typing.Type[ModelT]):
+        self.session = session
+        self.model = model
+        self.statement = select(model).where(
+            model.id == any_(bindparam("ids", type_=ARRAY(Uuid)))
+        )
+        self._cache: typing.Dict[uuid.UUID, asyncio.Future] = {}
+        self._queue: typing.List[uuid.UUID] = []
+        self._tasks: typing.Set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+
+    def load(self, pk: uuid.UUID) -> typing.Awaitable[typing.Optional[ModelT]]:
+        future = self._cache.get(pk)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._cache[pk] = loop.create_future()
+            if not self._queue:
+                loop.call_soon(self._schedule_dispatch)
+            self._queue.append(pk)
+        return future
+
+    async def load_many(
+        self, pks: typing.Iterable[uuid.UUID]
+    ) -> typing.List[typing.Optional[ModelT]]:
+        return list(await asyncio.gather(*(self.load(pk) for pk in pks)))
+
+    def prime(self, instance: ModelT) -> None:
+        """
+        Store an already loaded instance, so it won't be queried again
+        """
+        future = self._cache.get(instance.id)
+        if future is not None and not future.done():
+            # a load is pending, its callers get the primed instance
+            future.set_result(instance)
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(instance)
+        self._cache[instance.id] = future
+
+    def _schedule_dispatch(self) -> None:
+        pks, self._queue = self._queue, []
+        task = asyncio.create_task(self._dispatch(pks))
+        # keeps a reference to the task until it's done
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, pks: typing.List[uuid.UUID]) -> None:
+        try:
+            # the session is shared, batches must not run concurrently on it
+            async with self._lock:
+                result = await self.session.scalars(self.statement, {"ids": pks})
+                instances = {instance.id: instance for instance in result}
+        except Exception as e:
+            for pk in pks:
+                future = self._cache[pk]
+                # primed meanwhile, the instance stays cached
+                if not future.done():
+                    del self._cache[pk]
+                    future.set_exception(e)
+            return
+
+        for pk in pks:
+            future = self._cache[pk]
+            if not future.done():
+                future.set_result(instances.get(pk))
+
+
+class Loaders:
+    """
+    Registry of ModelLoader instances, one per model, sharing one DB session
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._loaders: typing.Dict[type, ModelLoader] = {}
+
+    def __getitem__(self, model: typing.Type[ModelT]) -> ModelLoader[ModelT]:
+        loader = self._loaders.get(model)
+        if loader is None:
+            loader = self._loaders[model] = ModelLoader(self.session, model)
+        return loader
+
+
+async def get_loaders(db: AsyncSession = Depends(get_db)) -> Loaders:
+    return Loaders(db)
+
+
+# reusable fastapi dependency, e.g. ``await loaders[User].load(user_id)``
+RequestLoaders = typing.Annotated[Loaders, Depends(get_loaders)]
@@ -0,0 +1,69 @@
+import typing
+from collections import OrderedDict
+
+_missing = object()
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache for a single namespace
+
+    Register it on the invalidation bus (``invalidation_bus.register_cache``)
+    so writes from any worker evict the affected keys.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 1024):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        value = self._data.get(key, _missing)
+        if value is _missing:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: typing.Hashable, value: typing.Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, keys: typing.Optional[typing.Iterable] = None) -> None:
+        """
+        Drop the given keys, or everything when keys is None
+        """
+        if keys is None:
+            self.invalidations += len(self._data)
+            self._data.clear()
+            return
+        for key in keys:
+            if self._data.pop(key, _missing) is not _missing:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -1,12 +1,18 @@
 import datetime
 import logging
+import random
 import sys
+import threading
+import time
 import traceback
+import typing
 from logging.config import dictConfig
 
 import orjson
 
 from core.config import settings
+from core.query_budget import query_stats
+from core.tracing import current_span
 from core.utils import get_pretty_context
 from schemas import BaseJsonLogSchema
 
@@ -52,6 +58,17 @@ class JSONLogFormatter(logging.Formatter):
             **context_data,
         )
 
+        span = current_span.get()
+        if span is not None:
+            json_log_fields.trace_id = span.trace_id
+            json_log_fields.span_id = span.span_id
+            json_log_fields.parent_id = span.parent_id
+
+        stats = query_stats.get()
+        if stats is not None:
+            json_log_fields.sql_count = stats.sql
+            json_log_fields.redis_count = stats.redis
+
         if hasattr(record, "props"):
             json_log_fields.props = record.props
 
@@ -78,7 +95,108 @@ class JSONLogFormatter(logging.Formatter):
         return json_log_object
 
 
-def setup_logging():
+class SamplingFilter(logging.Filter):
+    """
+    Keeps log volume proportional to distinct events instead of request rate
+
+    * identical messages (same logger, level, text and exception type) are
+      let through once per ``window`` seconds, the repeats are counted and
+      reported in one "suppressed N" record when the window ends
+    * the rest is sampled by ``rates`` (logger name -> share kept, the most
+      specific name wins, children included) or else ``level_rates``
+      (level name -> share kept)
+    * ERROR and above are never sampled, only deduplicated
+    """
+
+    def __init__(
+        self,
+        rates: typing.Optional[typing.Dict[str, float]] = None,
+        level_rates: typing.Optional[typing.Dict[str, float]] = None,
+        window: float = 10,
+        max_keys: int = 10_000,
+    ):
+        super().__init__()
+        # longest names first, so the first prefix match is the most specific
+        self.rates = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+        self.level_rates = {
+            logging.getLevelName(level.upper()): rate
+            for level, rate in (level_rates or {}).items()
+        }
+        self.window = window
+        self.max_keys = max_keys
+        # key -> [window start, suppressed count, last suppressed record]
+        self.seen: typing.Dict[tuple, list] = {}
+        self.last_sweep = time.monotonic()
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        summary = getattr(record, "sampling_summary", False)
+        if not summary and self.window > 0 and not self.deduplicate(record):
+            return False
+        if record.levelno >= logging.ERROR:
+            return True
+        rate = self.rate(record)
+        return rate >= 1 or random.random() < rate
+
+    def rate(self, record: logging.LogRecord) -> float:
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(f"{name}."):
+                return rate
+        return self.level_rates.get(record.levelno, 1.0)
+
+    def deduplicate(self, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        exc_type = record.exc_info[0].__name__ if record.exc_info else None
+        key = (record.name, record.levelno, record.getMessage(), exc_type)
+        expired = []
+        with self.lock:
+            if now - self.last_sweep >= self.window:
+                self.last_sweep = now
+                for seen_key, entry in list(self.seen.items()):
+                    if now - entry[0] >= self.window:
+                        del self.seen[seen_key]
+                        if entry[1]:
+                            expired.append(entry)
+            entry = self.seen.get(key)
+            if entry is not None and now - entry[0] >= self.window:
+                del self.seen[key]
+                if entry[1]:
+                    expired.append(entry)
+                entry = None
+            if entry is None:
+                if len(self.seen) < self.max_keys:
+                    self.seen[key] = [now, 0, None]
+                keep = True
+            else:
+                entry[1] += 1
+                entry[2] = record
+                keep = False
+        # outside the lock, the summaries pass through this filter again
+        for _, count, last in expired:
+            self.summarize(last, count)
+        return keep
+
+    def summarize(self, record: logging.LogRecord, count: int) -> None:
+        summary = logging.getLogger(record.name).makeRecord(
+            record.name,
+            record.levelno,
+            record.pathname,
+            record.lineno,
+            f"suppressed {count} identical messages: {record.getMessage()}",
+            None,
+            None,
+            extra={
+                "sampling_summary": True,
+                "extra": {"suppressed": count, "window": self.window},
+            },
+        )
+        logging.getLogger(record.name).handle(summary)
+
+
+def logging_config() -> dict:
+    """
+    ``dictConfig`` of the app, gunicorn gets it as ``logconfig_dict`` in main.py
+    """
     log_handler = ["handler"]
     formatter = {}
     if settings.PROD:
@@ -91,9 +209,18 @@ def setup_logging():
         "formatters": {
             "formatter": formatter,
         },
+        "filters": {
+            "sampling": {
+                "()": SamplingFilter,
+                "rates": settings.LOG_SAMPLE_RATES,
+                "level_rates": settings.LOG_LEVEL_SAMPLE_RATES,
+                "window": settings.LOG_DEDUP_WINDOW,
+            },
+        },
         "handlers": {
             "handler": {
                 "formatter": "formatter",
+                "filters": ["sampling"],
                 "class": "logging.StreamHandler",
                 "stream": sys.stdout,
             }
@@ -114,10 +241,24 @@ def setup_logging():
                 "level": settings.LOG_LEVEL,
                 "propagate": False,
             },
+            # UvicornWorker hands these handlers to uvicorn's loggers
+            "gunicorn.error": {
+                "handlers": log_handler,
+                "level": settings.LOG_LEVEL,
+                "propagate": False,
+            },
+            "gunicorn.access": {
+                "handlers": log_handler,
+                "level": settings.LOG_LEVEL,
+                "propagate": False,
+            },
         },
     }
+    return config
+
 
-    dictConfig(config)
+def setup_logging():
+    dictConfig(logging_config())
 
 
 logger = logging.getLogger("main")
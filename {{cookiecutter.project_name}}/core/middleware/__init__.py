@@ -1,2 +1,10 @@
 from .catch_exceptions_middleware import CatchExceptionsMiddleware  # noqa
-from .logging_middleware import URLPlugin  # noqa
+from .compression_middleware import CompressionMiddleware  # noqa
+from .deadline_middleware import DeadlineMiddleware  # noqa
+from .drain_middleware import DrainMiddleware  # noqa
+from .logging_middleware import TraceRequestIdPlugin, URLPlugin  # noqa
+from .msgpack_middleware import MessagePackMiddleware  # noqa
+from .profiling_middleware import ProfilingMiddleware  # noqa
+from .query_budget_middleware import QueryBudgetMiddleware  # noqa
+from .session_middleware import SessionReleaseMiddleware  # noqa
+from .tracing_middleware import TracingMiddleware  # noqa
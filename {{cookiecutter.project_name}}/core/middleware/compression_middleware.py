@@ -0,0 +1,256 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        # wbits offset by 16 produces the gzip container instead of raw zlib
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+# encoding name -> (encoder class, compression level), in server preference order
+ENCODERS: Dict[str, Tuple[type, int]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = (ZstdEncoder, 3)
+if brotli is not None:
+    ENCODERS["br"] = (BrotliEncoder, 4)
+ENCODERS["gzip"] = (GzipEncoder, 6)
+
+
+def negotiate_encoding(
+    accept_encoding: str, available: Iterable[str] = ENCODERS
+) -> Optional[str]:
+    """
+    Pick the best encoding from the Accept-Encoding header
+
+    Client q-values win, ties are resolved by the server preference order.
+
+    :param accept_encoding: value of the Accept-Encoding header
+    :param available: supported encodings, most preferred first
+    :return: name of the encoding or None when nothing acceptable is supported
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+
+    best, best_quality = None, 0.0
+    for name in available:
+        quality = weights.get(name, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Negotiated response compression (zstd, brotli, gzip)
+
+    Small bodies and content types outside of the allowlist are passed through.
+    Streamed bodies are compressed chunk by chunk, complete bodies served from
+    ``cached_paths`` (e.g. the OpenAPI document, admin statics) are compressed
+    once and kept in a bounded LRU keyed by the body digest.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        content_types: Iterable[str] = (
+            "application/json",
+            "application/msgpack",
+            "application/javascript",
+            "text/",
+            "image/svg+xml",
+        ),
+        cached_paths: Iterable[str] = (),
+        cache_size: int = 128,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = tuple(content_types)
+        self.cached_paths = tuple(path for path in cached_paths if path)
+        self.cache: OrderedDict = OrderedDict()
+        self.cache_size = cache_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, encoding, scope["path"], send)
+        await self.app(scope, receive, responder.send)
+
+    def is_cacheable(self, path: str) -> bool:
+        return bool(self.cached_paths) and path.startswith(self.cached_paths)
+
+    def compress_cached(self, encoding: str, body: bytes) -> bytes:
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self.cache.get(key)
+        if compressed is not None:
+            self.cache.move_to_end(key)
+            return compressed
+
+        compressed = self.create_encoder(encoding).finish(body)
+        self.cache[key] = compressed
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return compressed
+
+    @staticmethod
+    def create_encoder(encoding: str):
+        encoder_class, level = ENCODERS[encoding]
+        return encoder_class(level)
+
+
+class CompressionResponder:
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        encoding: str,
+        path: str,
+        send: Send,
+    ) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.path = path
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # postponed until we know whether the body gets compressed
+            self.start_message = message
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is not None:
+            if more_body:
+                chunk = self.encoder.compress(body)
+            else:
+                chunk = self.encoder.finish(body)
+            await self._send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+            return
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        if not self.should_compress(headers, body, more_body):
+            self.passthrough = True
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if not more_body:
+            if self.middleware.is_cacheable(self.path):
+                compressed = self.middleware.compress_cached(self.encoding, body)
+            else:
+                compressed = self.middleware.create_encoder(self.encoding).finish(body)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        # streaming response, compressed bodies are sent with chunked encoding
+        del headers["Content-Length"]
+        self.encoder = self.middleware.create_encoder(self.encoding)
+        await self._send(self.start_message)
+        await self._send(
+            {
+                "type": "http.response.body",
+                "body": self.encoder.compress(body),
+                "more_body": True,
+            }
+        )
+
+    def should_compress(
+        self, headers: MutableHeaders, body: bytes, more_body: bool
+    ) -> bool:
+        if "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(
+            self.middleware.content_types
+        ):
+            return False
+        if more_body:
+            return True
+        return len(body) >= self.middleware.minimum_size
@@ -0,0 +1,85 @@
+import asyncio
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.deadline import DeadlineWatch, deadline, deadline_watch, parse_timeout
+from core.exceptions import error_response
+from core.logging import logger
+
+
+class DeadlineMiddleware:
+    """
+    Enforces a per request deadline and stops work nobody will read
+
+    * the deadline comes from the ``REQUEST_TIMEOUT_HEADER`` header or
+      ``REQUEST_DEFAULT_TIMEOUT`` and is visible to the DB session and Redis
+      client through ``core.deadline``; routes can tighten it further, see
+      ``route_deadline``
+    * the handler is cancelled when the deadline passes (504 when nothing was
+      sent yet) or when the client disconnects before the response is complete
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = parse_timeout(
+            Headers(scope=scope).get(settings.REQUEST_TIMEOUT_HEADER)
+        )
+        started = asyncio.get_running_loop().time()
+        watch = DeadlineWatch(None if timeout is None else started + timeout)
+        # reset afterwards, the caller's task may serve further requests
+        token = deadline.set(watch.at)
+        watch_token = deadline_watch.set(watch)
+
+        response_started = False
+        response_complete = False
+        messages: asyncio.Queue = asyncio.Queue()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body":
+                response_complete = not message.get("more_body", False)
+            await send(message)
+
+        app_task = asyncio.create_task(self.app(scope, messages.get, send_wrapper))
+
+        async def watch_disconnect() -> None:
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete:
+                        app_task.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            done = await watch.wait(app_task)
+            if not done:
+                seconds = round(watch.at - started, 3)
+                logger.warning(f"request deadline of {seconds}s exceeded")
+                app_task.cancel()
+            try:
+                await app_task
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                if not done and not response_started:
+                    response = error_response(
+                        {"code": 504, "message": "Request timed out.", "fields": []},
+                        status_code=504,
+                    )
+                    await response(scope, receive, send)
+        finally:
+            watcher.cancel()
+            deadline_watch.reset(watch_token)
+            deadline.reset(token)
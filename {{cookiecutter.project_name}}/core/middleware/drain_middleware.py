@@ -0,0 +1,39 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.drain import drain
+from core.exceptions import error_response
+
+
+class DrainMiddleware:
+    """
+    Counts HTTP requests in flight and turns new requests away while the
+    worker shuts down, see ``core.drain``. Open WebSockets aren't waited for,
+    the server closes them on shutdown.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "websocket" and drain.draining:
+            # 1012 service restart, clients reconnect to another worker
+            await send({"type": "websocket.close", "code": 1012})
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if drain.draining:
+            response = error_response(
+                {"code": 503, "message": "Service is shutting down.", "fields": []},
+                status_code=503,
+                headers={"Connection": "close", "Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        drain.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            drain.exit()
@@ -1,7 +1,9 @@
 from typing import Optional, Union
 
 from starlette.requests import HTTPConnection, Request
-from starlette_context.plugins import Plugin
+from starlette_context.plugins import Plugin, RequestIdPlugin
+
+from core.tracing import current_span
 
 
 class URLPlugin(Plugin):
@@ -11,3 +13,24 @@ class URLPlugin(Plugin):
         self, request: Union[Request, HTTPConnection]
     ) -> Optional[str]:
         return str(request.url)
+
+
+class TraceRequestIdPlugin(RequestIdPlugin):
+    """
+    Request id defaulting to the trace id, so logs and traces share one key
+    """
+
+    def get_new_uuid(self) -> str:
+        span = current_span.get()
+        if span is None:
+            return super().get_new_uuid()
+        return span.trace_id
+
+    async def extract_value_from_header_by_key(
+        self, request: Union[Request, HTTPConnection]
+    ) -> Optional[str]:
+        value = await super().extract_value_from_header_by_key(request)
+        span = current_span.get()
+        if span is not None and value != span.trace_id:
+            span.attributes["http.request_id"] = value
+        return value
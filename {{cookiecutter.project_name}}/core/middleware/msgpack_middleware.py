@@ -0,0 +1,100 @@
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.responses import (
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPES,
+    NegotiatedResponse,
+    accepts_msgpack,
+    msgpack_loads,
+    response_media_type,
+)
+
+NEGOTIATED_MEDIA_TYPES = (JSON_MEDIA_TYPE, *MSGPACK_MEDIA_TYPES)
+
+
+class MessagePackMiddleware:
+    """
+    Content negotiation for MessagePack
+
+    * ``Accept: application/msgpack`` switches NegotiatedResponse (the default
+      response class) and the error handlers to MessagePack
+    * MessagePack request bodies are transcoded to JSON before routing, so the
+      endpoints and their validation stay untouched
+    * JSON and MessagePack responses get ``Vary: Accept``, so shared caches keep
+      one copy per representation
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        token = None
+        if accepts_msgpack(headers.get("accept", "")):
+            token = response_media_type.set(MSGPACK_MEDIA_TYPE)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                media_type = response_headers.get("content-type", "").split(";")[0]
+                if media_type.strip().lower() in NEGOTIATED_MEDIA_TYPES:
+                    response_headers.add_vary_header("Accept")
+            await send(message)
+
+        try:
+            content_type = headers.get("content-type", "").split(";")[0].strip()
+            if content_type.lower() in MSGPACK_MEDIA_TYPES:
+                await self.transcode_request(scope, receive, send_wrapper)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                response_media_type.reset(token)
+
+    async def transcode_request(self, scope: Scope, receive: Receive, send: Send):
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        try:
+            body = orjson.dumps(msgpack_loads(b"".join(chunks)))
+        except Exception:
+            response = NegotiatedResponse(
+                {"code": 400, "message": "Malformed MessagePack body.", "fields": []},
+                status_code=400,
+            )
+            await response(scope, receive, send)
+            return
+
+        scope = dict(scope)
+        scope["headers"] = [
+            (key, value)
+            for key, value in scope["headers"]
+            if key not in (b"content-type", b"content-length")
+        ] + [
+            (b"content-type", JSON_MEDIA_TYPE.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ]
+
+        sent = False
+
+        async def transcoded_receive() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, transcoded_receive, send)
@@ -0,0 +1,104 @@
+import asyncio
+import time
+import uuid
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.logging import logger
+from core.profiling import profiles, verify_profile_header
+from core.tracing import current_span
+
+
+class ProfilingMiddleware:
+    """
+    Samples the call stack of selected requests with pyinstrument
+
+    A request is profiled when it carries a valid signed ``PROFILING_HEADER``
+    (generated by a superuser in the admin) or when its path is armed in the
+    admin and wins the sampling draw. Otherwise the request passes straight
+    through, pyinstrument isn't even imported until the first profile.
+    The response carries the profile id, the outputs are stored in Redis.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.header = settings.PROFILING_HEADER.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or profiles.busy:
+            await self.app(scope, receive, send)
+            return
+
+        trigger = await self.trigger(scope)
+        if trigger is None or profiles.busy:
+            await self.app(scope, receive, send)
+            return
+
+        await self.profile(scope, receive, send, trigger)
+
+    async def trigger(self, scope: Scope):
+        path = scope["path"]
+        for name, value in scope["headers"]:
+            if name == self.header:
+                if verify_profile_header(value.decode("latin-1"), path):
+                    return "header"
+                break
+        if profiles.armed and profiles.sampled(path):
+            try:
+                if await profiles.claim(path):
+                    return "sampled"
+            except Exception:
+                logger.exception("claiming a profile failed")
+        return None
+
+    async def profile(self, scope: Scope, receive: Receive, send: Send, trigger):
+        from pyinstrument import Profiler
+
+        profile_id = uuid.uuid4().hex
+        status_code = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        profiles.busy = True
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            profiles.busy = False
+            span = current_span.get()
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "trigger": trigger,
+                "status": status_code or "",
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "trace_id": span.trace_id if span is not None else "",
+            }
+            profiles.spawn(self.store(profile_id, profiler, meta))
+
+    @staticmethod
+    async def store(profile_id: str, profiler, meta: dict) -> None:
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        # rendering walks the whole call tree, keep it off the event loop
+        text, speedscope = await asyncio.to_thread(
+            lambda: (
+                profiler.output_text(unicode=True, color=False),
+                profiler.output(renderer=SpeedscopeRenderer()),
+            )
+        )
+        await profiles.save(profile_id, meta, text, speedscope)
+        logger.info(
+            f"profiled {meta['method']} {meta['path']}",
+            extra={"extra": {"profile_id": profile_id, **meta}},
+        )
@@ -0,0 +1,41 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import settings
+from core.logging import logger
+from core.query_budget import QueryStats, query_stats
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts SQL statements and Redis commands per request
+
+    The counts end up in the JSON log of the request. In DEBUG/TEST the
+    request is also checked against its query budget and for repeated
+    statements, with ``QUERY_BUDGET_STRICT`` the offending statement raises.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.checked = bool(settings.DEBUG or settings.TEST)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(checked=self.checked)
+        token = query_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if self.checked:
+                self.report(stats, scope)
+            query_stats.reset(token)
+
+    @staticmethod
+    def report(stats: QueryStats, scope: Scope) -> None:
+        route = getattr(scope.get("route"), "path", scope["path"])
+        for problem in stats.problems():
+            logger.warning(
+                f"query budget: {route} {problem}", extra={"extra": {"route": route}}
+            )
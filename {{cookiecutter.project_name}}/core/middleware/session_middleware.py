@@ -0,0 +1,30 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.db_client import release_request_sessions, request_sessions
+
+
+class SessionReleaseMiddleware:
+    """
+    Returns the DB connections of a request to the pool once the response
+    starts. FastAPI only tears down ``yield`` dependencies after the response
+    was sent, which would keep the connection checked out for the whole send.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                await release_request_sessions()
+            await send(message)
+
+        token = request_sessions.set([])
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_sessions.reset(token)
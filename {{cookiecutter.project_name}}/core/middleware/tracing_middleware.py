@@ -0,0 +1,58 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.tracing import current_span, start_trace, tracer
+
+
+class TracingMiddleware:
+    """
+    Root span of every request, continuing the caller's W3C ``traceparent``
+
+    Spans of DB statements and Redis commands issued by the handler become its
+    children. The ``traceresponse`` header tells the caller the trace id, which
+    is also used as the request id when the client didn't send one.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        root = start_trace(
+            f"{method} {scope['path']}",
+            Headers(scope=scope).get("traceparent"),
+            attributes={"http.method": method, "http.target": scope["path"]},
+        )
+        status_code = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("traceresponse", root.traceparent())
+            await send(message)
+
+        token = current_span.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            root.set_error(e)
+            raise
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route is not None:
+                root.name = f"{method} {route}"
+                root.attributes["http.route"] = route
+            if status_code is not None:
+                root.attributes["http.status_code"] = status_code
+                if status_code >= 500:
+                    root.set_error()
+            root.finish()
+            current_span.reset(token)
+            tracer.submit(root)
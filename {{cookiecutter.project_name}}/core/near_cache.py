@@ -0,0 +1,214 @@
+import asyncio
+import typing
+
+from fastapi import Depends
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.connection import Connection
+from redis.exceptions import ConnectionError, TimeoutError
+
+from core.config import settings
+from core.local_cache import LocalCache
+from core.logging import logger
+from core.redis_client import get_client
+
+INVALIDATION_CHANNEL = "__redis__:invalidate"
+
+_missing = object()
+
+
+class NearCache:
+    """
+    Process local copy of hot Redis keys, kept coherent by Redis itself
+
+    Every data connection enables ``CLIENT TRACKING ... BCAST`` for the
+    configured prefixes and redirects invalidation pushes to one dedicated
+    connection subscribed to ``__redis__:invalidate`` (the RESP2 way, redis-py
+    doesn't speak RESP3 yet). Reads of tracked keys are then served from a
+    bounded LRU until Redis reports the key changed. When the invalidation
+    connection drops, the local copy is flushed and reads go to Redis until
+    tracking is re-established.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        prefixes: typing.Sequence[str] = (),
+        maxsize: int = 10_000,
+        enabled: bool = True,
+    ):
+        self.redis_url = str(redis_url)
+        self.prefixes = tuple(prefixes)
+        self.enabled = enabled
+        self.local = LocalCache("redis", maxsize)
+        self.client: typing.Optional[Redis] = None
+        self.connected = False
+        self.invalidation_messages = 0
+        self.flushes = 0
+        self._client_id: typing.Optional[int] = None
+        self._inflight: typing.Dict[str, asyncio.Future] = {}
+        self._dirty: typing.Set[str] = set()
+        self._tasks: typing.List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        if settings.REDIS_MODE != "standalone":
+            # tracking redirects only work within one server, reads go to the
+            # shared client which follows failovers and slots instead
+            if self.enabled:
+                logger.warning(f"redis near cache is off in {settings.REDIS_MODE}")
+                self.enabled = False
+            self.client = get_client()
+            return
+
+        pool = ConnectionPool.from_url(
+            self.redis_url,
+            encoding="utf8",
+            decode_responses=True,
+            redis_connect_func=self._on_connect if self.enabled else None,
+        )
+        self.client = Redis(connection_pool=pool)
+        if self.enabled:
+            self._tasks = [
+                asyncio.create_task(self._listen()),
+                asyncio.create_task(self._report()),
+            ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.client is not None and settings.REDIS_MODE == "standalone":
+            await self.client.close(close_connection_pool=True)
+        self.client = None
+
+    def is_tracked(self, key: str) -> bool:
+        return not self.prefixes or key.startswith(self.prefixes)
+
+    async def get(self, key: str) -> typing.Optional[str]:
+        if not (self.connected and self.is_tracked(key)):
+            return await self.client.get(key)
+
+        value = self.local.get(key, _missing)
+        if value is not _missing:
+            return value
+
+        # single flight: concurrent misses for one key share the Redis read
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the request owning the read was cancelled, not this one
+                if asyncio.current_task().cancelling():
+                    raise
+                return await self.client.get(key)
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await self.client.get(key)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved, the caller re-raises it
+            raise
+        else:
+            future.set_result(value)
+            # an invalidation received during the read means value may be stale
+            if key not in self._dirty and self.connected:
+                self.local.set(key, value)
+        finally:
+            self._inflight.pop(key, None)
+            self._dirty.discard(key)
+        return value
+
+    def invalidate(self, keys: typing.Optional[typing.Iterable[str]]) -> None:
+        if keys is None:
+            self.flushes += 1
+            self.local.invalidate()
+            self._dirty.update(self._inflight)
+            return
+        keys = list(keys)
+        self.local.invalidate(keys)
+        self._dirty.update(key for key in keys if key in self._inflight)
+
+    def stats(self) -> dict:
+        return {
+            **self.local.stats(),
+            "connected": self.connected,
+            "invalidation_messages": self.invalidation_messages,
+            "flushes": self.flushes,
+        }
+
+    async def _on_connect(self, connection: Connection) -> None:
+        await connection.on_connect()
+        if self._client_id is None:
+            return
+        args = ["CLIENT", "TRACKING", "ON", "REDIRECT", self._client_id, "BCAST"]
+        for prefix in self.prefixes:
+            args.extend(("PREFIX", prefix))
+        await connection.send_command(*args)
+        await connection.read_response()
+
+    async def _listen(self) -> None:
+        backoff = 0.5
+        while True:
+            pool = ConnectionPool.from_url(
+                self.redis_url, encoding="utf8", decode_responses=True
+            )
+            connection = None
+            try:
+                connection = await pool.get_connection("SUBSCRIBE")
+                await connection.send_command("CLIENT", "ID")
+                self._client_id = await connection.read_response()
+                await connection.send_command("SUBSCRIBE", INVALIDATION_CHANNEL)
+                await connection.read_response()
+                # idle data connections redirect to the previous client id,
+                # ones in use by a command are left alone; BCAST needs only one
+                # connection tracking for the new id, the ping reconnects it
+                await self.client.connection_pool.disconnect(inuse_connections=False)
+                await self.client.ping()
+                self.connected = True
+                backoff = 0.5
+                while True:
+                    message = await connection.read_response()
+                    if isinstance(message, list) and message[0] == "message":
+                        self.invalidation_messages += 1
+                        self.invalidate(message[2])
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionError, TimeoutError, OSError):
+                logger.warning("redis near cache lost its invalidation connection")
+            except Exception:
+                logger.exception("redis near cache invalidation listener failed")
+            finally:
+                self.connected = False
+                self._client_id = None
+                self.invalidate(None)
+                if connection is not None:
+                    await pool.release(connection)
+                await pool.disconnect()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(settings.REDIS_NEAR_CACHE_STATS_INTERVAL)
+            logger.info("redis near cache stats", extra={"extra": self.stats()})
+
+
+near_cache = NearCache(
+    settings.REDIS_URL,
+    prefixes=settings.REDIS_NEAR_CACHE_PREFIXES,
+    maxsize=settings.REDIS_NEAR_CACHE_SIZE,
+    enabled=settings.REDIS_NEAR_CACHE,
+)
+
+
+async def get_near_cache() -> NearCache:
+    return near_cache
+
+
+# reusable fastapi dependency
+HotCache = typing.Annotated[NearCache, Depends(get_near_cache)]
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import hmac
+import random
+import time
+import typing
+
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.invalidation import invalidation_bus
+from core.logging import logger
+from core.redis_client import atomic_pipeline, get_cache_context
+
+NAMESPACE = "profiling"
+# profile fields listed in the admin, without the (large) outputs
+SUMMARY_FIELDS = (
+    "id",
+    "method",
+    "path",
+    "trigger",
+    "status",
+    "duration_ms",
+    "trace_id",
+    "created_at",
+)
+
+
+def sign_profile_header(path: str, ttl: int = settings.PROFILING_HEADER_TTL) -> str:
+    """
+    Value of the ``PROFILING_HEADER`` header profiling requests to ``path``
+    until it expires
+    """
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_signature(path, expires)}"
+
+
+def verify_profile_header(value: str, path: str) -> bool:
+    expires, _, signature = value.partition(".")
+    try:
+        if int(expires) < time.time():
+            return False
+    except ValueError:
+        return False
+    # compare_digest only takes ASCII str, headers may carry any latin-1
+    expected = _signature(path, int(expires))
+    return hmac.compare_digest(signature.encode(), expected.encode())
+
+
+def _signature(path: str, expires: int) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(), f"{expires}:{path}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+class Profiles:
+    """
+    Armed routes and captured profiles, shared by the workers through Redis
+
+    * ``remaining`` hash of path -> profiles still to capture
+    * ``rates`` hash of path -> share of requests to profile
+    * ``profile:<id>`` hash with the metadata, text and speedscope output,
+      expires after ``PROFILING_TTL``
+    * ``index`` sorted set of recent profile ids
+
+    Every worker keeps the armed routes in memory and reloads them when
+    ``arm``/``disarm`` publish on the invalidation bus, so requests to routes
+    which aren't armed never touch Redis.
+    """
+
+    def __init__(self, prefix: str = settings.PROFILING_PREFIX):
+        # one hash tag, the pipelines below stay on one node of a cluster
+        prefix = "{" + prefix + "}"
+        self.remaining_key = f"{prefix}:remaining"
+        self.rates_key = f"{prefix}:rates"
+        self.index_key = f"{prefix}:index"
+        self.profile_key_prefix = f"{prefix}:profile:"
+        self.armed: typing.Dict[str, float] = {}
+        # one profiler per worker at a time, concurrent ones skew each other
+        self.busy = False
+        self._tasks: typing.Set[asyncio.Task] = set()
+
+    def profile_key(self, profile_id: str) -> str:
+        return f"{self.profile_key_prefix}{profile_id}"
+
+    async def start(self) -> None:
+        invalidation_bus.register(NAMESPACE, self._reload_soon)
+        try:
+            await self.reload()
+        except Exception:
+            logger.exception("loading armed profiling routes failed")
+
+    async def stop(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def reload(self) -> None:
+        async with get_cache_context() as redis:
+            rates = await redis.hgetall(self.rates_key)
+        self.armed = {path: float(rate) for path, rate in rates.items()}
+
+    def _reload_soon(self, keys: typing.Optional[typing.List[str]]) -> None:
+        self.spawn(self.reload())
+
+    def spawn(self, coro: typing.Awaitable) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("profiling task failed", exc_info=task.exception())
+
+    async def arm(self, path: str, count: int, rate: float = 1.0) -> None:
+        async with get_cache_context() as redis:
+            async with atomic_pipeline(redis) as pipe:
+                pipe.hset(self.remaining_key, path, count)
+                pipe.hset(self.rates_key, path, rate)
+                await pipe.execute()
+        await invalidation_bus.publish(NAMESPACE)
+
+    async def disarm(self, path: str) -> None:
+        async with get_cache_context() as redis:
+            async with atomic_pipeline(redis) as pipe:
+                pipe.hdel(self.remaining_key, path)
+                pipe.hdel(self.rates_key, path)
+                await pipe.execute()
+        await invalidation_bus.publish(NAMESPACE)
+
+    def sampled(self, path: str) -> bool:
+        rate = self.armed.get(path)
+        return rate is not None and random.random() < rate
+
+    async def claim(self, path: str) -> bool:
+        """
+        Take one of the remaining profiles of an armed route
+        """
+        async with get_cache_context() as redis:
+            remaining = await redis.hincrby(self.remaining_key, path, -1)
+        if remaining <= 0:
+            await self.disarm(path)
+        return remaining >= 0
+
+    async def armed_routes(self, redis: Redis) -> typing.List[dict]:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.remaining_key)
+            pipe.hgetall(self.rates_key)
+            remaining, rates = await pipe.execute()
+        return [
+            {"path": path, "remaining": remaining.get(path, 0), "rate": rate}
+            for path, rate in sorted(rates.items())
+        ]
+
+    async def save(self, profile_id: str, meta: dict, text: str, speedscope: str):
+        now = time.time()
+        async with get_cache_context() as redis:
+            async with atomic_pipeline(redis) as pipe:
+                pipe.hset(
+                    self.profile_key(profile_id),
+                    mapping={
+                        **meta,
+                        "id": profile_id,
+                        "created_at": now,
+                        "text": text,
+                        "speedscope": speedscope,
+                    },
+                )
+                pipe.expire(self.profile_key(profile_id), settings.PROFILING_TTL)
+                pipe.zadd(self.index_key, {profile_id: now})
+                pipe.zremrangebyscore(self.index_key, 0, now - settings.PROFILING_TTL)
+                await pipe.execute()
+
+    async def recent(self, redis: Redis, limit: int = 100) -> typing.List[dict]:
+        profile_ids = await redis.zrevrange(self.index_key, 0, limit - 1)
+        async with redis.pipeline(transaction=False) as pipe:
+            for profile_id in profile_ids:
+                pipe.hmget(self.profile_key(profile_id), *SUMMARY_FIELDS)
+            rows = await pipe.execute()
+        return [dict(zip(SUMMARY_FIELDS, row)) for row in rows if row[0]]
+
+    async def get(self, redis: Redis, profile_id: str) -> typing.Optional[dict]:
+        return await redis.hgetall(self.profile_key(profile_id)) or None
+
+
+profiles = Profiles()
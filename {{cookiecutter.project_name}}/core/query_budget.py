@@ -0,0 +1,105 @@
+import typing
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import settings
+from core.utils import fingerprint
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    """
+    SQL statements and Redis commands issued while serving one request
+
+    Counting is always on, statement shapes are only kept when ``checked``
+    (DEBUG/TEST) to spot the same statement running over and over (N+1).
+    """
+
+    __slots__ = ("sql", "redis", "shapes", "checked", "sql_budget", "redis_budget")
+
+    def __init__(self, checked: bool = False):
+        self.sql = 0
+        self.redis = 0
+        self.shapes: typing.Counter[str] = Counter()
+        self.checked = checked
+        self.sql_budget: int = settings.QUERY_BUDGET_SQL
+        self.redis_budget: int = settings.QUERY_BUDGET_REDIS
+
+    def problems(self) -> typing.List[str]:
+        problems = []
+        if self.sql > self.sql_budget:
+            problems.append(f"{self.sql} SQL statements, budget {self.sql_budget}")
+        if self.redis > self.redis_budget:
+            problems.append(f"{self.redis} Redis commands, budget {self.redis_budget}")
+        for statement, count in self.shapes.items():
+            if count >= settings.QUERY_BUDGET_REPEATED:
+                problems.append(f"possible N+1, {count}x {statement}")
+        return problems
+
+
+query_stats: ContextVar[typing.Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+def _check_strict(stats: QueryStats, shape: typing.Optional[str] = None) -> None:
+    if not settings.QUERY_BUDGET_STRICT:
+        return
+    if stats.sql > stats.sql_budget:
+        raise QueryBudgetExceeded(
+            f"{stats.sql} SQL statements, budget {stats.sql_budget}"
+        )
+    if stats.redis > stats.redis_budget:
+        raise QueryBudgetExceeded(
+            f"{stats.redis} Redis commands, budget {stats.redis_budget}"
+        )
+    if shape is not None and stats.shapes[shape] >= settings.QUERY_BUDGET_REPEATED:
+        raise QueryBudgetExceeded(f"possible N+1, {stats.shapes[shape]}x {shape}")
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = query_stats.get()
+    if stats is None:
+        return
+    stats.sql += 1
+    shape = None
+    if stats.checked:
+        shape = fingerprint(statement)
+        stats.shapes[shape] += 1
+    _check_strict(stats, shape)
+
+
+def count_redis_command() -> None:
+    stats = query_stats.get()
+    if stats is None:
+        return
+    stats.redis += 1
+    if stats.checked:
+        _check_strict(stats)
+
+
+def setup_query_counting(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+
+
+def query_budget(sql: typing.Optional[int] = None, redis: typing.Optional[int] = None):
+    """
+    Per route budget, e.g. ``dependencies=[Depends(query_budget(sql=2))]``
+    """
+
+    async def dependency() -> None:
+        stats = query_stats.get()
+        if stats is None:
+            return
+        if sql is not None:
+            stats.sql_budget = sql
+        if redis is not None:
+            stats.redis_budget = redis
+
+    return dependency
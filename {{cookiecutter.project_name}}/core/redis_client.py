@@ -1,16 +1,231 @@
+import asyncio
 import typing
+from collections import defaultdict
 from contextlib import asynccontextmanager
 
 from fastapi import Depends
-from redis.asyncio import Redis
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.connection import SSLConnection, parse_url
+from redis.asyncio.sentinel import Sentinel
+from redis.crc import key_slot
 
 from core.config import settings
+from core.deadline import remaining
+from core.query_budget import count_redis_command
+from core.tracing import SPAN_KIND_CLIENT, span
+
+
+class InstrumentationMixin:
+    async def execute_command(self, *args, **options):
+        count_redis_command()
+        with span(f"redis {args[0]}", SPAN_KIND_CLIENT, {"db.system": "redis"}):
+            timeout = remaining()
+            if timeout is None:
+                return await super().execute_command(*args, **options)
+            # the command can't outlive the request deadline
+            async with asyncio.timeout(timeout):
+                return await super().execute_command(*args, **options)
+
+
+class InstrumentedRedis(InstrumentationMixin, Redis):
+    pass
+
+
+class InstrumentedRedisCluster(InstrumentationMixin, RedisCluster):
+    pass
+
+
+def _address(node: str) -> typing.Tuple[str, int]:
+    host, _, port = node.rpartition(":")
+    return host, int(port)
+
+
+def _connection_kwargs() -> dict:
+    """
+    Credentials, database and TLS of ``REDIS_URL``, shared by every mode
+    """
+    url = parse_url(str(settings.REDIS_URL))
+    return {
+        "username": url.get("username"),
+        "password": url.get("password"),
+        "db": url.get("db", 0),
+        "ssl": url.get("connection_class") is SSLConnection,
+        "encoding": "utf8",
+        "decode_responses": True,
+    }
+
+
+# shared by every client of this process, warmed up in the app lifespan
+redis_pool = ConnectionPool.from_url(
+    str(settings.REDIS_URL), encoding="utf8", decode_responses=True
+)
+_clients: typing.Dict[str, Redis] = {}
+
+
+def create_client(role: str = "primary") -> Redis:
+    """
+    Client for ``REDIS_MODE``: standalone, sentinel or cluster
+
+    :param role: ``primary``, ``replica`` for reads which may lag behind
+        (with ``REDIS_READ_FROM_REPLICAS``) or ``pubsub``; redis-py has no
+        cluster pub/sub, a cluster publishes and subscribes through one node
+        since messages are broadcast to every node anyway
+    """
+    mode = settings.REDIS_MODE
+    if mode == "standalone":
+        return InstrumentedRedis(connection_pool=redis_pool)
+
+    if mode == "sentinel":
+        sentinel = Sentinel(
+            [_address(node) for node in settings.REDIS_SENTINELS],
+            **_connection_kwargs(),
+        )
+        if role == "replica" and settings.REDIS_READ_FROM_REPLICAS:
+            return sentinel.slave_for(
+                settings.REDIS_SENTINEL_SERVICE, redis_class=InstrumentedRedis
+            )
+        return sentinel.master_for(
+            settings.REDIS_SENTINEL_SERVICE, redis_class=InstrumentedRedis
+        )
+
+    if mode == "cluster":
+        nodes = settings.REDIS_CLUSTER_NODES or [
+            f"{settings.REDIS_URL.host}:{settings.REDIS_URL.port or 6379}"
+        ]
+        kwargs = _connection_kwargs()
+        kwargs.pop("db", None)  # a cluster only has database 0
+        if role == "pubsub":
+            host, port = _address(nodes[0])
+            return InstrumentedRedis(host=host, port=port, **kwargs)
+        return InstrumentedRedisCluster(
+            startup_nodes=[ClusterNode(*_address(node)) for node in nodes],
+            read_from_replicas=settings.REDIS_READ_FROM_REPLICAS,
+            **kwargs,
+        )
+
+    raise ValueError(f"Unknown REDIS_MODE {mode}")
+
+
+def get_client(role: str = "primary") -> Redis:
+    """
+    Process wide client of the role, created on first use
+    """
+    if role not in _clients:
+        if settings.REDIS_MODE == "cluster" and role == "replica":
+            # replica reads are routed by the cluster client itself
+            _clients[role] = get_client()
+        else:
+            _clients[role] = create_client(role)
+    return _clients[role]
+
+
+async def warm_cache_pool(size: int) -> None:
+    """
+    Open ``size`` connections of the shared pool ahead of traffic
+    """
+    client = get_client()
+    if isinstance(client, RedisCluster):
+        # discovers the slots and connects to every node
+        await client.initialize()
+        return
+    pool = client.connection_pool
+    connections = await asyncio.gather(
+        *(pool.get_connection("PING") for _ in range(size))
+    )
+    for connection in connections:
+        await pool.release(connection)
+
+
+async def cleanup_cache_pool() -> None:
+    clients = list({id(client): client for client in _clients.values()}.values())
+    _clients.clear()
+    for client in clients:
+        if isinstance(client, RedisCluster):
+            await client.close()
+        else:
+            # sentinel clients own their pool, the standalone one is shared
+            await client.close(close_connection_pool=True)
+    await redis_pool.disconnect()
+
+
+def atomic_pipeline(redis: Redis):
+    """
+    MULTI/EXEC pipeline. redis-py has no cluster transactions, on a cluster
+    the commands are only pipelined; callers keep the keys under one hash tag
+    so they still go to a single node, in order.
+    """
+    return redis.pipeline(transaction=not isinstance(redis, RedisCluster))
+
+
+def group_by_slot(keys: typing.Iterable[str]) -> typing.Dict[int, typing.List[str]]:
+    groups = defaultdict(list)
+    for key in keys:
+        groups[key_slot(key.encode())].append(key)
+    return groups
+
+
+async def mget_by_slot(
+    redis: Redis, keys: typing.Sequence[str]
+) -> typing.List[typing.Optional[str]]:
+    """
+    MGET of keys from any slot, one MGET per slot sent in a single pipeline
+    (on a cluster: one round trip per node, in parallel)
+    """
+    if not keys:
+        return []
+    groups = group_by_slot(keys)
+    async with redis.pipeline(transaction=False) as pipe:
+        for slot_keys in groups.values():
+            pipe.mget(slot_keys)
+        results = await pipe.execute()
+    values = {}
+    for slot_keys, slot_values in zip(groups.values(), results):
+        values.update(zip(slot_keys, slot_values))
+    return [values[key] for key in keys]
+
+
+async def mset_by_slot(
+    redis: Redis,
+    mapping: typing.Mapping[str, typing.Any],
+    ex: typing.Optional[int] = None,
+) -> None:
+    """
+    MSET grouped by slot like ``mget_by_slot``, with an optional expiry
+    """
+    if not mapping:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for slot_keys in group_by_slot(mapping).values():
+            pipe.mset({key: mapping[key] for key in slot_keys})
+            if ex is not None:
+                for key in slot_keys:
+                    pipe.expire(key, ex)
+        await pipe.execute()
+
+
+async def delete_by_slot(redis: Redis, keys: typing.Sequence[str]) -> int:
+    if not keys:
+        return 0
+    async with redis.pipeline(transaction=False) as pipe:
+        for slot_keys in group_by_slot(keys).values():
+            pipe.delete(*slot_keys)
+        return sum(await pipe.execute())
 
 
 async def get_cache(redis_url: str = settings.REDIS_URL, **kwargs) -> Redis:
+    if redis_url == settings.REDIS_URL and not kwargs:
+        # shared client, commands are bounded by the deadline in execute_command
+        yield get_client()
+        return
+
     session = None
+    timeout = remaining()
+    if timeout is not None:
+        kwargs.setdefault("socket_timeout", timeout)
+        kwargs.setdefault("socket_connect_timeout", timeout)
     try:
-        session = await Redis.from_url(
+        session = await InstrumentedRedis.from_url(
             redis_url, encoding="utf8", decode_responses=True, **kwargs
         )
         yield session
@@ -19,6 +234,17 @@ async def get_cache(redis_url: str = settings.REDIS_URL, **kwargs) -> Redis:
             await session.close()
 
 
-# reusable fastapi dependency
+async def get_replica() -> Redis:
+    yield get_client("replica")
+
+
+async def get_pubsub() -> Redis:
+    yield get_client("pubsub")
+
+
+# reusable fastapi dependencies
 Cache = typing.Annotated[Redis, Depends(get_cache)]
+CacheReplica = typing.Annotated[Redis, Depends(get_replica)]
 get_cache_context = asynccontextmanager(get_cache)
+get_replica_context = asynccontextmanager(get_replica)
+get_pubsub_context = asynccontextmanager(get_pubsub)
@@ -0,0 +1,94 @@
+import datetime
+import enum
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+import msgpack
+import orjson
+from fastapi.responses import ORJSONResponse
+from starlette.responses import Response
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (
+    MSGPACK_MEDIA_TYPE,
+    "application/x-msgpack",
+    "application/vnd.msgpack",
+)
+
+# media type negotiated for the current request, set by MessagePackMiddleware
+response_media_type: ContextVar[str] = ContextVar(
+    "response_media_type", default=JSON_MEDIA_TYPE
+)
+
+
+def accepts_msgpack(accept: str) -> bool:
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        if media_type.strip().lower() in MSGPACK_MEDIA_TYPES:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def negotiate_media_type(accept: str) -> str:
+    return MSGPACK_MEDIA_TYPE if accepts_msgpack(accept) else JSON_MEDIA_TYPE
+
+
+def msgpack_default(obj: Any) -> Any:
+    """
+    Fallback for types msgpack can't handle, mirrors what orjson emits
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def msgpack_dumps(content: Any) -> bytes:
+    return msgpack.packb(content, default=msgpack_default)
+
+
+def msgpack_loads(content: bytes) -> Any:
+    return msgpack.unpackb(content, raw=False)
+
+
+def prerender(content: Any) -> Dict[str, bytes]:
+    """
+    Serialize a static body once for every supported media type
+    """
+    return {
+        JSON_MEDIA_TYPE: orjson.dumps(content),
+        MSGPACK_MEDIA_TYPE: msgpack_dumps(content),
+    }
+
+
+class NegotiatedResponse(ORJSONResponse):
+    """
+    ORJSONResponse which renders MessagePack when the client asked for it
+    """
+
+    def render(self, content: Any) -> bytes:
+        if response_media_type.get() == MSGPACK_MEDIA_TYPE:
+            # render runs before the headers are built, so this sets Content-Type
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return msgpack_dumps(content)
+        return super().render(content)
+
+
+def prerendered_response(
+    bodies: Dict[str, bytes],
+    status_code: int,
+    headers: Optional[Dict] = None,
+    media_type: Optional[str] = None,
+) -> Response:
+    media_type = media_type or response_media_type.get()
+    return Response(
+        bodies[media_type],
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
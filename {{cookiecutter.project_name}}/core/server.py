@@ -0,0 +1,43 @@
+import sys
+import typing
+from types import FrameType
+
+from gunicorn.arbiter import Arbiter
+from uvicorn import Server
+from uvicorn.workers import UvicornWorker
+
+from core.config import settings
+from core.drain import drain
+
+
+class DrainingServer(Server):
+    """
+    Uvicorn server which starts draining as soon as it is asked to exit;
+    requests in flight get ``DRAIN_TIMEOUT`` before they are cancelled
+    """
+
+    def handle_exit(self, sig: int, frame: typing.Optional[FrameType]) -> None:
+        drain.start()
+        super().handle_exit(sig, frame)
+
+
+class DrainingUvicornWorker(UvicornWorker):
+    """
+    Gunicorn worker running ``DrainingServer``, set gunicorn's
+    ``graceful_timeout`` above ``DRAIN_TIMEOUT`` to leave time for the lifespan
+    shutdown
+    """
+
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "timeout_graceful_shutdown": settings.DRAIN_TIMEOUT,
+    }
+
+    async def _serve(self) -> None:
+        # UvicornWorker._serve with the server class swapped
+        self.config.app = self.wsgi
+        server = DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
@@ -0,0 +1,180 @@
+import asyncio
+import random
+import re
+import time
+import typing
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import settings
+from core.logging import logger
+from core.utils import fingerprint, get_pretty_context
+
+_EXPLAINABLE = ("select", "with")
+# WITH ... DELETE/UPDATE/INSERT, or SELECT ... FOR UPDATE, when searched anywhere
+_WRITES = re.compile(r"\b(insert|update|delete|merge)\b", re.IGNORECASE)
+
+
+def analyzable(statement: str) -> bool:
+    """
+    ANALYZE executes the statement, only plain SELECTs are worth that risk
+    """
+    if not statement.lstrip().lower().startswith("select"):
+        return False
+    return not _WRITES.search(statement)
+
+
+def redact(parameters: typing.Any) -> typing.Any:
+    """
+    Keep the shape of the parameters, drop the values
+    """
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    if parameters is None:
+        return None
+    return f"<{type(parameters).__name__}>"
+
+
+class SlowQueryLog:
+    """
+    Records statements slower than ``SLOW_QUERY_THRESHOLD`` milliseconds
+
+    Every slow statement is logged with redacted parameters and the request
+    context, and aggregated per fingerprint for the admin view (per worker).
+    A sample of slow SELECTs is re-run as ``EXPLAIN (ANALYZE, BUFFERS)`` on a
+    separate connection inside a rolled back transaction; statements which may
+    write, e.g. a data-modifying CTE, only get a plain ``EXPLAIN``.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = settings.SLOW_QUERY_THRESHOLD,
+        explain_sample_rate: float = settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+        top_size: int = settings.SLOW_QUERY_TOP_SIZE,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.top_size = top_size
+        self.statements: typing.Dict[str, dict] = {}
+        self.engine: typing.Optional[AsyncEngine] = None
+        self._explaining: typing.Set[asyncio.Task] = set()
+
+    def setup(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after)
+
+    def top(self, limit: typing.Optional[int] = None) -> typing.List[dict]:
+        statements = sorted(
+            self.statements.values(), key=lambda item: item["total_ms"], reverse=True
+        )
+        return statements[:limit]
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None or conn.info.get("explain"):
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= self.threshold_ms:
+            self.record(statement, parameters, duration_ms, executemany)
+
+    def record(self, statement, parameters, duration_ms: float, executemany: bool):
+        context = get_pretty_context()
+        key = fingerprint(statement)
+        params = redact(parameters[:1] if executemany else parameters)
+        logger.warning(
+            f"slow query took {duration_ms:.0f}ms",
+            extra={
+                "extra": {
+                    "statement": key,
+                    "parameters": params,
+                    "duration_ms": round(duration_ms, 1),
+                    "executemany": executemany,
+                }
+            },
+        )
+
+        entry = self.statements.get(key)
+        if entry is None:
+            if len(self.statements) >= self.top_size:
+                # keep the heaviest statements, replace the cheapest one
+                cheapest = min(
+                    self.statements, key=lambda k: self.statements[k]["total_ms"]
+                )
+                del self.statements[cheapest]
+            entry = self.statements[key] = {
+                "statement": key,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "explain": None,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["last_parameters"] = params
+        entry["last_request_id"] = context.get("request_id")
+        entry["last_url"] = context.get("url")
+        entry["last_seen"] = time.time()
+
+        if (
+            not executemany
+            and key.lower().startswith(_EXPLAINABLE)
+            and random.random() < self.explain_sample_rate
+        ):
+            self._schedule_explain(entry, statement, parameters, duration_ms)
+
+    def _schedule_explain(
+        self, entry: dict, statement: str, parameters, duration_ms: float
+    ) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.explain(entry, statement, parameters, duration_ms))
+        self._explaining.add(task)
+        task.add_done_callback(self._explaining.discard)
+
+    async def explain(
+        self, entry: dict, statement: str, parameters, duration_ms: float
+    ) -> None:
+        try:
+            async with self.engine.connect() as conn:
+                conn.sync_connection.info["explain"] = True
+                try:
+                    async with conn.begin() as transaction:
+                        # a pathological plan must not hold the connection forever
+                        timeout = max(int(duration_ms * 2), 1000)
+                        await conn.exec_driver_sql(
+                            f"SET LOCAL statement_timeout = {timeout}"
+                        )
+                        options = "ANALYZE, BUFFERS, " if analyzable(statement) else ""
+                        result = await conn.exec_driver_sql(
+                            f"EXPLAIN ({options}FORMAT JSON) {statement}", parameters
+                        )
+                        plan = result.scalar()
+                        # ANALYZE executes the statement, never keep its effects
+                        await transaction.rollback()
+                finally:
+                    conn.sync_connection.info.pop("explain", None)
+        except Exception:
+            logger.exception("slow query EXPLAIN failed")
+            return
+
+        if isinstance(plan, str):
+            plan = orjson.loads(plan)
+        entry["explain"] = orjson.dumps(plan, option=orjson.OPT_INDENT_2).decode()
+        logger.warning(
+            "slow query plan",
+            extra={"extra": {"statement": entry["statement"], "plan": plan}},
+        )
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,373 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import typing
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import settings
+from core.utils import fingerprint
+
+# core.logging formats the trace ids, so this module logs through a child logger
+tracing_logger = logging.getLogger("main.tracing")
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+SPAN_KIND_CONSUMER = 5
+
+
+class Trace:
+    """
+    Spans of one trace recorded by this process
+
+    Every span is recorded, whether the trace is exported is decided when the
+    root span finishes: head sampled (``sampled`` flag of the incoming
+    traceparent or ``TRACING_SAMPLE_RATE``), errored or slow.
+    """
+
+    __slots__ = ("trace_id", "sampled", "error", "spans", "dropped")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.error = False
+        self.spans: typing.List["Span"] = []
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "attributes",
+        "start",
+        "end",
+        "error",
+    )
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        parent_id: typing.Optional[str] = None,
+        attributes: typing.Optional[dict] = None,
+    ):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start = time.time_ns()
+        self.end: typing.Optional[int] = None
+        self.error = False
+        if len(trace.spans) < settings.TRACING_MAX_SPANS:
+            trace.spans.append(self)
+        else:
+            trace.dropped += 1
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.time_ns()
+        return (end - self.start) / 1_000_000
+
+    def set_error(self, exc: typing.Optional[BaseException] = None) -> None:
+        self.error = True
+        self.trace.error = True
+        if exc is not None:
+            self.attributes["exception.type"] = type(exc).__name__
+            self.attributes["exception.message"] = str(exc)
+
+    def finish(self) -> None:
+        if self.end is None:
+            self.end = time.time_ns()
+
+    def traceparent(self) -> str:
+        flags = "01" if self.trace.sampled else "00"
+        return f"00-{self.trace_id}-{self.span_id}-{flags}"
+
+
+current_span: ContextVar[typing.Optional[Span]] = ContextVar(
+    "current_span", default=None
+)
+
+
+def parse_traceparent(
+    value: typing.Optional[str],
+) -> typing.Optional[typing.Tuple[str, str, bool]]:
+    """
+    Parse a W3C ``traceparent`` header
+
+    :return: trace id, parent span id and the sampled flag, None when invalid
+    """
+    if not value:
+        return None
+    parts = value.strip().lower().split("-")
+    if len(parts) < 4:
+        return None
+    version, trace_id, parent_id, flags = parts[:4]
+    if version == "ff" or (version == "00" and len(parts) != 4):
+        return None
+    if len(version) != 2 or len(trace_id) != 32 or len(parent_id) != 16:
+        return None
+    if len(flags) != 2:
+        return None
+    try:
+        for part in (version, trace_id, parent_id, flags):
+            int(part, 16)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def start_trace(
+    name: str,
+    traceparent: typing.Optional[str] = None,
+    kind: int = SPAN_KIND_SERVER,
+    attributes: typing.Optional[dict] = None,
+) -> Span:
+    """
+    Root span of this process, continuing the caller's trace when given
+    """
+    parsed = parse_traceparent(traceparent)
+    if parsed is not None:
+        trace_id, parent_id, sampled = parsed
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+    return Span(Trace(trace_id, sampled), name, kind, parent_id, attributes)
+
+
+def start_span(
+    name: str, kind: int = SPAN_KIND_INTERNAL, attributes: typing.Optional[dict] = None
+) -> typing.Optional[Span]:
+    """
+    Child of the current span, None outside of a trace
+    """
+    parent = current_span.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, kind, parent.span_id, attributes)
+
+
+@contextmanager
+def span(
+    name: str, kind: int = SPAN_KIND_INTERNAL, attributes: typing.Optional[dict] = None
+) -> typing.Iterator[typing.Optional[Span]]:
+    child = start_span(name, kind, attributes)
+    if child is None:
+        yield None
+        return
+    token = current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.set_error(e)
+        raise
+    finally:
+        child.finish()
+        current_span.reset(token)
+
+
+def propagation_headers() -> typing.Dict[str, str]:
+    """
+    Headers continuing the current trace in an outgoing request
+    """
+    current = current_span.get()
+    if current is None:
+        return {}
+    return {"traceparent": current.traceparent()}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._trace_span = start_span(
+        "db " + statement.split(None, 1)[0].upper() if statement else "db",
+        SPAN_KIND_CLIENT,
+        {"db.system": "postgresql", "db.statement": fingerprint(statement)},
+    )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    db_span = getattr(context, "_trace_span", None)
+    if db_span is not None:
+        db_span.finish()
+
+
+def _handle_error(exception_context) -> None:
+    context = exception_context.execution_context
+    db_span = getattr(context, "_trace_span", None) if context else None
+    if db_span is not None:
+        db_span.set_error(exception_context.original_exception)
+        db_span.finish()
+
+
+def setup_tracing(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> typing.List[dict]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+def to_otlp(traces: typing.Iterable[Trace]) -> bytes:
+    """
+    OTLP/HTTP JSON ``ExportTraceServiceRequest`` body
+    """
+    spans = [
+        {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start),
+            "endTimeUnixNano": str(span.end),
+            "attributes": _otlp_attributes(span.attributes),
+            # STATUS_CODE_OK / STATUS_CODE_ERROR
+            "status": {"code": 2 if span.error else 1},
+        }
+        for trace in traces
+        for span in trace.spans
+        # spans of cancelled work never finished
+        if span.end is not None
+    ]
+    resource = {
+        "service.name": settings.PROJECT_NAME,
+        "service.version": settings.VERSION,
+        "deployment.environment": settings.ENVIRONMENT,
+    }
+    return orjson.dumps(
+        {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes(resource)},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+                }
+            ]
+        }
+    )
+
+
+class Tracer:
+    """
+    Decides which finished traces are kept and exports them in the background,
+    with ``TRACING_ENABLED`` only
+
+    ``TRACING_EXPORTER`` is ``file`` (OTLP JSON lines appended to
+    ``TRACING_FILE``), ``otlp`` (POSTed to ``TRACING_OTLP_ENDPOINT``, e.g. an
+    OpenTelemetry collector or ``scripts/trace_collector.py``) or ``none``.
+    Traces are dropped rather than queued without bound when the sink is slow.
+    """
+
+    def __init__(
+        self,
+        exporter: str = settings.TRACING_EXPORTER,
+        slow_threshold_ms: float = settings.TRACING_SLOW_THRESHOLD,
+        queue_size: int = settings.TRACING_EXPORT_QUEUE,
+        batch_size: int = 100,
+    ):
+        self.exporter = exporter
+        self.slow_threshold_ms = slow_threshold_ms
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def should_export(self, root: Span) -> bool:
+        trace = root.trace
+        return (
+            trace.sampled or trace.error or root.duration_ms >= self.slow_threshold_ms
+        )
+
+    def submit(self, root: Span) -> None:
+        if self._task is None or not self.should_export(root):
+            return
+        try:
+            self.queue.put_nowait(root.trace)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def start(self) -> None:
+        if not settings.TRACING_ENABLED or self.exporter == "none":
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        try:
+            # let the queued traces go out
+            await asyncio.wait_for(self.queue.join(), timeout=5)
+        except asyncio.TimeoutError:
+            tracing_logger.warning(f"{self.queue.qsize()} traces not exported")
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await asyncio.to_thread(self.export, to_otlp(batch))
+            except Exception:
+                tracing_logger.exception(f"exporting {len(batch)} traces failed")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def export(self, payload: bytes) -> None:
+        if self.exporter == "file":
+            with open(settings.TRACING_FILE, "ab") as f:
+                f.write(payload + b"\n")
+        elif self.exporter == "otlp":
+            request = urllib.request.Request(
+                settings.TRACING_OTLP_ENDPOINT,
+                data=payload,
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+        else:
+            raise ValueError(f"Unknown trace exporter {self.exporter}")
+
+
+tracer = Tracer()
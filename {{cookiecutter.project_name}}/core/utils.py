@@ -1,3 +1,7 @@
+import hashlib
+import re
+import typing
+
 from starlette_context import context
 from starlette_context.header_keys import HeaderKeys
 
@@ -10,3 +14,40 @@ def get_pretty_context():
         )
     except Exception:
         return dict()
+
+
+# collapses expanded IN lists, so "IN ($1, $2)" and "IN ($1, $2, $3)" group
+_IN_LIST = re.compile(r"\((?:\s*\$\d+\s*,)+\s*\$\d+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Shape of a SQL statement, for grouping executions of the same statement
+    """
+    return _IN_LIST.sub("($n)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def weak_etag(*parts) -> str:
+    """
+    Build a weak ETag from the parts identifying a representation
+    """
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(), digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: typing.Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of the If-None-Match header against the current ETag
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque_tag
+        for candidate in if_none_match.split(",")
+    )
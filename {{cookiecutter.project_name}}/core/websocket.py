@@ -0,0 +1,135 @@
+import asyncio
+import typing
+from collections import defaultdict
+
+import orjson
+from redis.exceptions import ConnectionError, TimeoutError
+from starlette.websockets import WebSocket
+
+from core.config import settings
+from core.logging import logger
+from core.redis_client import get_pubsub_context
+
+
+class Connection:
+    """
+    WebSocket with a bounded send queue, drained by its own sender task.
+    When the client can't keep up, new messages are dropped instead of
+    growing the queue.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, message: str) -> bool:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def sender(self) -> None:
+        while True:
+            message = await self.queue.get()
+            await self.websocket.send_text(message)
+
+
+class ConnectionRegistry:
+    """
+    Per worker registry of WebSocket connections grouped by user
+
+    The worker holds a single Redis subscription and fans the messages out to
+    its local sockets. Messages travel as ``"<user_id> <json>"`` so the JSON is
+    serialized once by the publisher and forwarded as is.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        queue_size: int = settings.WEBSOCKET_QUEUE_SIZE,
+        max_dropped: int = settings.WEBSOCKET_MAX_DROPPED,
+    ):
+        self.channel = channel
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self.connections: typing.Dict[str, typing.Set[Connection]] = defaultdict(set)
+        self._task: typing.Optional[asyncio.Task] = None
+        self._closing: typing.Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return sum(len(connections) for connections in self.connections.values())
+
+    def connect(self, websocket: WebSocket, user_id: str) -> Connection:
+        connection = Connection(websocket, user_id, self.queue_size)
+        self.connections[user_id].add(connection)
+        return connection
+
+    def disconnect(self, connection: Connection) -> None:
+        connections = self.connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.connections[connection.user_id]
+
+    def dispatch(self, user_id: str, message: str) -> int:
+        delivered = 0
+        for connection in tuple(self.connections.get(user_id, ())):
+            if connection.offer(message):
+                delivered += 1
+            elif connection.dropped > self.max_dropped:
+                logger.warning(f"closing slow websocket consumer of user {user_id}")
+                self.disconnect(connection)
+                task = asyncio.create_task(connection.websocket.close(code=1013))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+        return delivered
+
+    def handle_message(self, data: str) -> None:
+        user_id, _, message = data.partition(" ")
+        if message:
+            self.dispatch(user_id, message)
+
+    async def publish(self, user_id: str, data: typing.Any) -> None:
+        """
+        Send data to every socket of the user, on any worker
+        """
+        message = f"{user_id} {orjson.dumps(data).decode()}"
+        async with get_pubsub_context() as redis:
+            await redis.publish(self.channel, message)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self) -> None:
+        backoff = 0.5
+        while True:
+            try:
+                async with get_pubsub_context() as redis:
+                    async with redis.pubsub() as pubsub:
+                        await pubsub.subscribe(self.channel)
+                        backoff = 0.5
+                        async for message in pubsub.listen():
+                            if message["type"] == "message":
+                                self.handle_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionError, TimeoutError, OSError):
+                logger.warning("websocket subscription lost, reconnecting")
+            except Exception:
+                logger.exception("websocket subscriber failed, reconnecting")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+websocket_registry = ConnectionRegistry(settings.WEBSOCKET_CHANNEL)
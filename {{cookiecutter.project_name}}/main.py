@@ -2,10 +2,11 @@ import logging
 import multiprocessing
 
 from gunicorn.app.wsgiapp import WSGIApplication
-from uvicorn import Config, Server
+from uvicorn import Config
 
 from core.config import settings
-from core.logging import setup_logging
+from core.logging import logging_config, setup_logging
+from core.server import DrainingServer
 
 
 class StandaloneApplication(WSGIApplication):
@@ -29,12 +30,27 @@ if __name__ == "__main__":
         options = {
             "bind": "0.0.0.0:8000",
             "workers": (multiprocessing.cpu_count() * 2) + 1,
-            "worker_class": "uvicorn.workers.UvicornWorker",
+            "worker_class": "core.server.DrainingUvicornWorker",
+            # workers drain requests for up to DRAIN_TIMEOUT on SIGTERM, then
+            # run the lifespan shutdown
+            "graceful_timeout": settings.DRAIN_TIMEOUT + 10,
+            # merged into gunicorn's defaults, whose root logger needs a handler
+            "logconfig_dict": {
+                **logging_config(),
+                "root": {"level": "INFO", "handlers": ["handler"]},
+            },
         }
         StandaloneApplication("app:app", options).run()
     else:
         log_level = logging.getLevelName(settings.LOG_LEVEL)
-        server = Server(Config("app:app", log_level=log_level, reload=True, workers=1))
+        config = Config(
+            "app:app",
+            log_level=log_level,
+            reload=True,
+            workers=1,
+            timeout_graceful_shutdown=settings.DRAIN_TIMEOUT,
+        )
+        server = DrainingServer(config)
         setup_logging()
 
         server.run()
@@ -19,6 +19,7 @@ config = context.config
 # This line sets up loggers basically.
 fileConfig(config.config_file_name)
 
+from migrations.utils import is_dry_run  # noqa
 from models import BaseUUIDModel  # noqa
 
 target_metadata = BaseUUIDModel.metadata
@@ -62,9 +63,30 @@ async def run_async_migrations(connectable):
     await connectable.dispose()
 
 
+def configure(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # committed one by one, the online helpers of migrations/utils.py step
+        # out of the transaction and previous migrations must not be undone
+        transaction_per_migration=True,
+    )
+
+
 def do_run_migrations(connection):
-    context.configure(connection=connection, target_metadata=target_metadata)
+    if is_dry_run():
+        # begun before configure, so alembic sees an external transaction and
+        # doesn't commit per migration; everything, version table included, is
+        # rolled back at the end
+        transaction = connection.begin()
+        try:
+            configure(connection)
+            context.run_migrations()
+        finally:
+            transaction.rollback()
+        return
 
+    configure(connection)
     with context.begin_transaction():
         context.run_migrations()
 
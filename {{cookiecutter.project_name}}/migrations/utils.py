@@ -0,0 +1,303 @@
+import hashlib
+import json
+import logging
+import time
+import typing
+
+import sqlalchemy as sa
+from alembic import context, op
+
+UPDATED_AT_FUNCTION = "set_updated_at"
+
+
+def create_updated_at_function():
+    """
+    Create (or replace) the trigger function which bumps ``updated_at``
+    on every UPDATE, including bulk and Core level statements
+    """
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION {UPDATED_AT_FUNCTION}() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = now();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+
+def drop_updated_at_function():
+    op.execute(f"DROP FUNCTION IF EXISTS {UPDATED_AT_FUNCTION}()")
+
+
+def create_updated_at_trigger(table: str):
+    """
+    Attach the ``updated_at`` trigger to a table using ``CreatedUpdatedMixin``
+    """
+    op.execute(
+        f'CREATE TRIGGER {table}_updated_at BEFORE UPDATE ON "{table}" '
+        f"FOR EACH ROW EXECUTE FUNCTION {UPDATED_AT_FUNCTION}()"
+    )
+
+
+def drop_updated_at_trigger(table: str):
+    op.execute(f'DROP TRIGGER IF EXISTS {table}_updated_at ON "{table}"')
+
+
+# Online schema changes for large tables
+# -----------------------------------------------------------------------------
+# Run with ``alembic -x dry_run=true upgrade head`` to roll everything back and
+# only report what the helpers below would do, estimated from table statistics.
+
+PROGRESS_TABLE = "_migration_progress"
+# retried SQLSTATEs: lock_not_available (lock_timeout) and deadlock_detected
+RETRIED_ERRORS = ("55P03", "40P01")
+# rough build speed, only used by the dry run of the index helpers
+INDEX_BYTES_PER_SECOND = 50 * 1024 * 1024
+
+logger = logging.getLogger("alembic.online")
+
+
+def is_dry_run() -> bool:
+    value = context.get_x_argument(as_dictionary=True).get("dry_run", "")
+    return value.lower() in ("1", "true", "yes")
+
+
+def table_stats(table: str) -> dict:
+    """
+    Estimated rows and size on disk, from the planner statistics
+    """
+    row = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT greatest(reltuples, 0)::bigint AS rows, "
+                "pg_total_relation_size(oid) AS bytes "
+                "FROM pg_class WHERE oid = to_regclass(:table)"
+            ),
+            {"table": f'"{table}"'},
+        )
+        .mappings()
+        .one()
+    )
+    return dict(row)
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: typing.Sequence[str],
+    unique: bool = False,
+    where: typing.Optional[str] = None,
+):
+    """
+    CREATE INDEX CONCURRENTLY outside the migration transaction, so writes to
+    the table continue while the index builds
+
+    A previous build which failed leaves an INVALID index behind, it is dropped
+    and built again.
+    """
+    if is_dry_run():
+        stats = table_stats(table)
+        logger.info(
+            f"dry run: index {name} on {table} ({stats['rows']} rows, "
+            f"{stats['bytes'] // 2**20}MB) builds in about "
+            f"{stats['bytes'] / INDEX_BYTES_PER_SECOND:.0f}s"
+        )
+        return
+
+    with op.get_context().autocommit_block():
+        valid = (
+            op.get_bind()
+            .execute(
+                sa.text(
+                    "SELECT indisvalid FROM pg_index "
+                    "WHERE indexrelid = to_regclass(:name)"
+                ),
+                {"name": f'"{name}"'},
+            )
+            .scalar()
+        )
+        if valid:
+            return
+        if valid is not None:
+            logger.warning(f"dropping the invalid index {name} of a failed build")
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(
+            name,
+            table,
+            columns,
+            unique=unique,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text(where) if where else None,
+        )
+
+
+def drop_index_concurrently(name: str, table: str):
+    if is_dry_run():
+        logger.info(f"dry run: drop index {name} on {table}")
+        return
+    with op.get_context().autocommit_block():
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def _sqlstate(error: sa.exc.DBAPIError) -> typing.Optional[str]:
+    orig = error.orig
+    return getattr(orig, "pgcode", None) or getattr(orig.__cause__, "sqlstate", None)
+
+
+def backfill(
+    table: str,
+    set_: str,
+    where: str = "true",
+    name: typing.Optional[str] = None,
+    key: str = "id",
+    batch_size: int = 1000,
+    pause: float = 0.1,
+    lock_timeout: int = 1000,
+    max_retries: int = 10,
+):
+    """
+    UPDATE ``table`` SET ``set_`` in chunks of ``batch_size`` rows, walking the
+    ``key`` (primary key) range, every chunk committed on its own
+
+    * ``where`` should skip rows already done (``column IS NULL``), so the
+      backfill can be run again from scratch
+    * the last key of every chunk is saved in the ``_migration_progress`` table
+      with the chunk's UPDATE, a re-run continues where the previous one
+      stopped; the row is deleted once the backfill finished
+    * chunks wait at most ``lock_timeout`` milliseconds for row locks held by
+      the application and are retried with backoff instead of queueing
+    * ``pause`` seconds between chunks leave room to replicas and autovacuum
+
+    With ``-x dry_run=true`` one chunk runs in a savepoint which is rolled
+    back, the duration is extrapolated from it and the estimated row count.
+    """
+    bind = op.get_bind()
+    name = name or f"{table}:{hashlib.md5(f'{set_}|{where}'.encode()).hexdigest()}"
+    key_type = bind.execute(
+        sa.text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = to_regclass(:table) AND attname = :key"
+        ),
+        {"table": f'"{table}"', "key": key},
+    ).scalar_one()
+    after = f'WHERE "{key}" > CAST(:last_key AS {key_type})'
+    # one statement per chunk: the UPDATE and its progress commit together
+    chunks = {
+        first: sa.text(
+            f"""
+            WITH batch AS (
+                SELECT "{key}" FROM "{table}"
+                {"" if first else after}
+                ORDER BY "{key}" LIMIT :batch_size
+            ), updated AS (
+                UPDATE "{table}" SET {set_} FROM batch
+                WHERE "{table}"."{key}" = batch."{key}" AND ({where})
+                RETURNING 1
+            ), last AS (
+                SELECT "{key}"::text AS last_key FROM batch
+                ORDER BY "{key}" DESC LIMIT 1
+            ), progress AS (
+                INSERT INTO {PROGRESS_TABLE} (name, last_key, rows, updated_at)
+                SELECT :name, last_key, (SELECT count(*) FROM updated), now()
+                FROM last
+                ON CONFLICT (name) DO UPDATE SET
+                    last_key = EXCLUDED.last_key,
+                    rows = {PROGRESS_TABLE}.rows + EXCLUDED.rows,
+                    updated_at = EXCLUDED.updated_at
+            )
+            SELECT (SELECT last_key FROM last) AS last_key,
+                (SELECT count(*) FROM updated) AS rows
+            """
+        )
+        for first in (True, False)
+    }
+
+    if is_dry_run():
+        _backfill_estimate(bind, chunks[True], table, where, name, batch_size, pause)
+        return
+
+    with op.get_context().autocommit_block():
+        _create_progress_table(bind)
+        last_key, total = bind.execute(
+            sa.text(f"SELECT last_key, rows FROM {PROGRESS_TABLE} WHERE name = :name"),
+            {"name": name},
+        ).one_or_none() or (None, 0)
+        if last_key is not None:
+            logger.info(f"resuming backfill {name} after {last_key}, {total} rows")
+        bind.execute(sa.text(f"SET lock_timeout = {int(lock_timeout)}"))
+        started = time.monotonic()
+        retries = 0
+        try:
+            while True:
+                try:
+                    params = {"batch_size": batch_size, "name": name}
+                    if last_key is not None:
+                        params["last_key"] = last_key
+                    row = bind.execute(chunks[last_key is None], params).one()
+                except sa.exc.DBAPIError as e:
+                    if _sqlstate(e) not in RETRIED_ERRORS or retries >= max_retries:
+                        raise
+                    retries += 1
+                    backoff = min(pause * 2**retries, 30)
+                    logger.warning(f"backfill {name} chunk locked, retry in {backoff}s")
+                    time.sleep(backoff)
+                    continue
+                retries = 0
+                if row.last_key is None:
+                    break
+                last_key = row.last_key
+                total += row.rows
+                logger.info(
+                    f"backfill {name}: {total} rows, up to {last_key}, "
+                    f"{time.monotonic() - started:.0f}s"
+                )
+                time.sleep(pause)
+        finally:
+            bind.execute(sa.text("RESET lock_timeout"))
+        bind.execute(
+            sa.text(f"DELETE FROM {PROGRESS_TABLE} WHERE name = :name"), {"name": name}
+        )
+        logger.info(f"backfill {name} done, {total} rows")
+
+
+def _create_progress_table(bind):
+    bind.execute(
+        sa.text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} (
+                name text PRIMARY KEY,
+                last_key text NOT NULL,
+                rows bigint NOT NULL DEFAULT 0,
+                updated_at timestamptz NOT NULL DEFAULT now()
+            )
+            """
+        )
+    )
+
+
+def _backfill_estimate(bind, chunk, table, where, name, batch_size, pause):
+    plan = bind.execute(
+        sa.text(f'EXPLAIN (FORMAT JSON) SELECT 1 FROM "{table}" WHERE {where}')
+    ).scalar_one()
+    # the JSON plan comes back decoded or as text depending on the driver
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    rows = plan[0]["Plan"]["Plan Rows"]
+    stats = table_stats(table)
+    chunks = max(stats["rows"] // batch_size, 1)
+
+    savepoint = bind.begin_nested()
+    try:
+        _create_progress_table(bind)
+        started = time.monotonic()
+        bind.execute(chunk, {"batch_size": batch_size, "name": name})
+        seconds = time.monotonic() - started
+    finally:
+        savepoint.rollback()
+    logger.info(
+        f"dry run: backfill {name} updates about {rows} of {stats['rows']} rows "
+        f"in {chunks} chunks, about {chunks * (seconds + pause):.0f}s "
+        f"(first chunk took {seconds * 1000:.0f}ms)"
+    )
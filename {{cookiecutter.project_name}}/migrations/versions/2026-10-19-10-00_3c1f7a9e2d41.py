@@ -0,0 +1,16 @@
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3c1f7a9e2d41"
+down_revision = "b95e30d8fd74"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # "user".id is the primary key, its constraint index already covers lookups
+    op.drop_index(op.f("ix_user_id"), table_name="user")
+
+
+def downgrade():
+    op.create_index(op.f("ix_user_id"), "user", ["id"], unique=False)
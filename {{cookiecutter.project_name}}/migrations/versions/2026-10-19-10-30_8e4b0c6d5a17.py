@@ -0,0 +1,50 @@
+import sqlalchemy as sa
+from alembic import op
+
+from migrations.utils import (
+    create_updated_at_function,
+    create_updated_at_trigger,
+    drop_updated_at_function,
+    drop_updated_at_trigger,
+)
+
+# revision identifiers, used by Alembic.
+revision = "8e4b0c6d5a17"
+down_revision = "3c1f7a9e2d41"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for column in ("created_at", "updated_at"):
+        op.alter_column(
+            "user",
+            column,
+            type_=sa.DateTime(timezone=True),
+            existing_type=sa.DateTime(),
+            existing_nullable=True,
+            server_default=sa.text("now()"),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'",
+        )
+    op.execute(
+        'UPDATE "user" SET created_at = coalesce(created_at, now()), '
+        "updated_at = coalesce(updated_at, now()) "
+        "WHERE created_at IS NULL OR updated_at IS NULL"
+    )
+    create_updated_at_function()
+    create_updated_at_trigger("user")
+
+
+def downgrade():
+    drop_updated_at_trigger("user")
+    drop_updated_at_function()
+    for column in ("created_at", "updated_at"):
+        op.alter_column(
+            "user",
+            column,
+            type_=sa.DateTime(),
+            existing_type=sa.DateTime(timezone=True),
+            existing_nullable=True,
+            server_default=None,
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'",
+        )
@@ -1,27 +1,80 @@
+import os
+import threading
+import time
 import typing
 import uuid
 from datetime import datetime
 
+from sqlalchemy import DateTime, FetchedValue, func
 from sqlalchemy.orm import Mapped, declarative_base, mapped_column
 
 Base = declarative_base()
 
+_uuid7_lock = threading.Lock()
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (version 7 layout from RFC 9562)
+
+    The first 48 bits hold the unix timestamp in milliseconds, so new keys are
+    appended to the right-hand side of the primary key b-tree instead of being
+    scattered across it. The 12 bits of ``rand_a`` are used as a counter, which
+    keeps the ids monotonic within a process even inside the same millisecond.
+    """
+    global _uuid7_last_ms, _uuid7_counter
+
+    with _uuid7_lock:
+        timestamp_ms = time.time_ns() // 1_000_000
+        if timestamp_ms > _uuid7_last_ms:
+            _uuid7_last_ms = timestamp_ms
+            _uuid7_counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                # counter overflow, borrow the next millisecond
+                _uuid7_last_ms += 1
+                _uuid7_counter = 0
+        timestamp_ms, counter = _uuid7_last_ms, _uuid7_counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & 0x3FFFFFFFFFFFFFFF
+    value = (
+        (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+        | 0x7 << 76
+        | counter << 64
+        | 0b10 << 62
+        | rand_b
+    )
+    return uuid.UUID(int=value)
+
 
 class CreatedUpdatedMixin:
+    """
+    Timestamps are filled in by the database: ``now()`` on insert and the
+    ``set_updated_at`` trigger on update (see ``migrations/utils.py``), so Core
+    and bulk statements keep them correct as well
+    """
+
     updated_at: Mapped[typing.Optional[datetime]] = mapped_column(
-        default=datetime.utcnow, onupdate=datetime.utcnow
+        DateTime(timezone=True),
+        server_default=func.now(),
+        server_onupdate=FetchedValue(),
     )
     created_at: Mapped[typing.Optional[datetime]] = mapped_column(
-        default=datetime.utcnow
+        DateTime(timezone=True), server_default=func.now()
     )
 
 
 class BaseUUIDModel(Base, CreatedUpdatedMixin):
     __abstract__ = True
+    # fetch server generated columns through RETURNING instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
 
+    # the primary key constraint already creates a unique index on id
     id: Mapped[uuid.UUID] = mapped_column(
-        default=uuid.uuid4,
+        default=uuid7,
         primary_key=True,
-        index=True,
         nullable=False,
     )
@@ -4,7 +4,7 @@ from fastapi_users.db import SQLAlchemyBaseUserTableUUID, SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, Session, mapped_column
 
-from models.base import BaseUUIDModel
+from models.base import BaseUUIDModel, uuid7
 
 
 class User(BaseUUIDModel, SQLAlchemyBaseUserTableUUID):
@@ -19,3 +19,28 @@ class User(BaseUUIDModel, SQLAlchemyBaseUserTableUUID):
 class UserDatabase(SQLAlchemyUserDatabase):
     def __init__(self, session: typing.Union[Session, AsyncSession, None] = None):
         super().__init__(session, User)
+
+    async def create(self, create_dict: typing.Dict[str, typing.Any]) -> User:
+        # timestamps are fetched with RETURNING (eager_defaults), no refresh needed
+        user = self.user_table(**create_dict)
+        self.session.add(user)
+        await self.session.commit()
+        return user
+
+    async def update(
+        self, user: User, update_dict: typing.Dict[str, typing.Any]
+    ) -> User:
+        for key, value in update_dict.items():
+            setattr(user, key, value)
+        self.session.add(user)
+        await self.session.commit()
+        return user
+
+
+async def warm_up_queries(session: AsyncSession) -> None:
+    """
+    Run the user lookups of authentication once, e.g. on a fresh connection
+    """
+    user_db = UserDatabase(session)
+    await user_db.get(uuid7())
+    await user_db.get_by_email("warm-up@example.invalid")
@@ -1,4 +1,8 @@
 from .error_response import ErrorResponseSchema  # noqa
-from .health_response import FailingHealthResponseSchema, HealthResponseSchema  # noqa
+from .health_response import (  # noqa
+    FailingHealthResponseSchema,
+    HealthResponseSchema,
+    ReadinessResponseSchema,
+)
 from .json_logs import BaseJsonLogSchema  # noqa
 from .user import UserCreate, UserRead  # noqa
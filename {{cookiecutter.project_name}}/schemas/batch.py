@@ -0,0 +1,53 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import validator
+
+from .base_model import BaseModel
+
+
+class BatchRequestItemSchema(BaseModel):
+    """
+    Single sub-request of a batch, url is relative to the app root
+    """
+
+    method: str = "GET"
+    url: str
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+    @validator("method")
+    def upper_method(cls, v: str) -> str:
+        return v.upper()
+
+    @validator("url")
+    def relative_url(cls, v: str) -> str:
+        if not v.startswith("/"):
+            raise ValueError("url has to be a path starting with /")
+        return v
+
+    @validator("headers")
+    def encodable_headers(cls, v: Dict[str, str]) -> Dict[str, str]:
+        # sent as latin-1 bytes like the headers of any HTTP request
+        for key, value in v.items():
+            try:
+                key.encode("ascii")
+                value.encode("latin-1")
+            except UnicodeEncodeError:
+                raise ValueError(f"header {key!r} isn't latin-1") from None
+            if "\r" in key + value or "\n" in key + value:
+                raise ValueError(f"header {key!r} contains a line break")
+        return v
+
+
+class BatchRequestSchema(BaseModel):
+    requests: List[BatchRequestItemSchema]
+
+
+class BatchResponseItemSchema(BaseModel):
+    status: int
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+
+class BatchResponseSchema(BaseModel):
+    responses: List[BatchResponseItemSchema]
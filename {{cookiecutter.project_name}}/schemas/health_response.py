@@ -10,6 +10,14 @@ class HealthResponseSchema(BaseModel):
     cache: bool = True
 
 
+class ReadinessResponseSchema(BaseModel):
+    """
+    Readiness response format
+    """
+
+    ready: bool
+
+
 class FailingHealthResponseSchema(BaseModel):
     """
     Health response format
@@ -2,10 +2,10 @@ from typing import List, Union
 
 from pydantic import Field
 
-from .base_model import BaseModelUUID
+from .base_model import BaseModel
 
 
-class BaseJsonLogSchema(BaseModelUUID):
+class BaseJsonLogSchema(BaseModel):
     """
     Main log in JSON format
     """
@@ -23,6 +23,8 @@ class BaseJsonLogSchema(BaseModelUUID):
     trace_id: str = None
     span_id: str = None
     parent_id: str = None
+    sql_count: int = None
+    redis_count: int = None
 
     user_id: str = None
     redis_websocket_key: str = None
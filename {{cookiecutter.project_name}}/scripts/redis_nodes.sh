@@ -0,0 +1,66 @@
+#!/usr/bin/env bash
+# Local multi-node Redis made of plain redis-server processes, for trying the
+# sentinel and cluster modes (REDIS_MODE) without docker.
+#
+#   scripts/redis_nodes.sh cluster   # 3 primaries + 3 replicas on 7000-7005
+#   scripts/redis_nodes.sh sentinel  # primary 6380, replica 6381, sentinels 26379-26381
+#   scripts/redis_nodes.sh stop
+set -euo pipefail
+
+DIR="${REDIS_NODES_DIR:-/tmp/redis-nodes}"
+
+start_node() {
+    local port=$1
+    shift
+    mkdir -p "$DIR/$port"
+    redis-server --port "$port" --dir "$DIR/$port" --daemonize yes \
+        --logfile "$DIR/$port/redis.log" --pidfile "$DIR/$port/redis.pid" \
+        --save "" --appendonly no "$@"
+}
+
+wait_node() {
+    until redis-cli -p "$1" ping >/dev/null 2>&1; do sleep 0.1; done
+}
+
+case "${1:-}" in
+cluster)
+    ports=(7000 7001 7002 7003 7004 7005)
+    nodes=()
+    for port in "${ports[@]}"; do
+        start_node "$port" --cluster-enabled yes \
+            --cluster-config-file "$DIR/$port/nodes.conf"
+        nodes+=("127.0.0.1:$port")
+    done
+    for port in "${ports[@]}"; do wait_node "$port"; done
+    redis-cli --cluster create "${nodes[@]}" --cluster-replicas 1 --cluster-yes
+    echo "REDIS_MODE=cluster REDIS_CLUSTER_NODES='[\"127.0.0.1:7000\"]'"
+    ;;
+sentinel)
+    start_node 6380
+    start_node 6381 --replicaof 127.0.0.1 6380
+    wait_node 6380
+    for port in 26379 26380 26381; do
+        mkdir -p "$DIR/$port"
+        cat >"$DIR/$port/sentinel.conf" <<CONF
+port $port
+dir $DIR/$port
+sentinel monitor mymaster 127.0.0.1 6380 2
+sentinel down-after-milliseconds mymaster 5000
+sentinel failover-timeout mymaster 10000
+CONF
+        redis-server "$DIR/$port/sentinel.conf" --sentinel --daemonize yes \
+            --logfile "$DIR/$port/redis.log" --pidfile "$DIR/$port/redis.pid"
+    done
+    echo "REDIS_MODE=sentinel REDIS_SENTINELS='[\"127.0.0.1:26379\",\"127.0.0.1:26380\",\"127.0.0.1:26381\"]'"
+    ;;
+stop)
+    for pidfile in "$DIR"/*/redis.pid; do
+        [ -f "$pidfile" ] && kill "$(cat "$pidfile")" 2>/dev/null || true
+    done
+    rm -rf "$DIR"
+    ;;
+*)
+    echo "usage: $0 cluster|sentinel|stop" >&2
+    exit 1
+    ;;
+esac
@@ -0,0 +1,77 @@
+"""
+Stand-in for an OpenTelemetry collector, for local runs and tests.
+Accepts OTLP/HTTP JSON exports on /v1/traces, appends every request body as a
+line to the output file and prints one line per received span.
+
+Usage: python scripts/trace_collector.py [--port 4318] [--output traces.jsonl]
+
+Point the app at it with TRACING_ENABLED=true, TRACING_EXPORTER=otlp and
+TRACING_OTLP_ENDPOINT=http://localhost:4318/v1/traces
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    output: str = "traces.jsonl"
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path != "/v1/traces":
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.send_error(400, "Expected OTLP JSON")
+            return
+
+        with self.lock, open(self.output, "ab") as f:
+            f.write(body + b"\n")
+        for resource_spans in payload.get("resourceSpans", []):
+            for scope_spans in resource_spans.get("scopeSpans", []):
+                for span in scope_spans.get("spans", []):
+                    duration_ms = (
+                        int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])
+                    ) / 1_000_000
+                    error = " ERROR" if span.get("status", {}).get("code") == 2 else ""
+                    print(
+                        f"{span['traceId']} {span['spanId']} "
+                        f"{span.get('parentSpanId') or '-':16} "
+                        f"{duration_ms:9.2f}ms {span['name']}{error}"
+                    )
+
+        response = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="traces.jsonl")
+    args = parser.parse_args()
+
+    CollectorHandler.output = args.output
+    server = ThreadingHTTPServer((args.host, args.port), CollectorHandler)
+    print(f"collecting traces on http://{args.host}:{args.port}/v1/traces")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Fixtures isolating every test without migrating or truncating per test
+
+* the Alembic migrations run once into the ``<name>_test_template`` database,
+  rebuilt only when ``migrations/`` changes; concurrent xdist workers take
+  turns through an advisory lock
+* every xdist worker clones the template into its own database, see
+  ``Settings.assemble_db_connection``
+* every test runs in a transaction rolled back afterwards, sessions of the app
+  (``get_db``, ``get_db_context``) join it through savepoints so their commits
+  and rollbacks stay inside the test
+* Redis is an in-memory fakeredis shared by every client role, flushed per test
+
+Run with ``pytest -n auto``.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import pathlib
+
+os.environ.setdefault("TEST", "true")
+
+import asyncpg  # noqa: E402
+import fakeredis.aioredis  # noqa: E402
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from core import engine, redis_client, session_factory, settings  # noqa: E402
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+URL = make_url(settings.ASYNC_DATABASE_URL)
+WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+DATABASE = URL.database
+TEMPLATE = f"{DATABASE.removesuffix(f'_{WORKER}') if WORKER else DATABASE}_template"
+
+
+def migrations_hash() -> str:
+    digest = hashlib.sha256()
+    for path in sorted((ROOT / "migrations").rglob("*.py")):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def admin_dsn() -> str:
+    url = URL.set(drivername="postgresql", database="postgres")
+    return url.render_as_string(hide_password=False)
+
+
+def alembic_config(database: str, *x: str) -> Config:
+    """
+    Alembic config migrating ``database``, ``x`` are ``-x`` arguments
+    """
+    config = Config(str(ROOT / "alembic.ini"), cmd_opts=argparse.Namespace(x=x))
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    config.attributes["connection"] = create_async_engine(URL.set(database=database))
+    return config
+
+
+async def migrate_template(connection: asyncpg.Connection, version: str) -> None:
+    await connection.execute(f'CREATE DATABASE "{TEMPLATE}"')
+    # env.py runs its own event loop, which needs a thread without one
+    await asyncio.to_thread(command.upgrade, alembic_config(TEMPLATE), "head")
+    await connection.execute(f"COMMENT ON DATABASE \"{TEMPLATE}\" IS '{version}'")
+    await connection.execute(f'ALTER DATABASE "{TEMPLATE}" WITH IS_TEMPLATE true')
+
+
+async def create_database() -> None:
+    connection = await asyncpg.connect(admin_dsn())
+    try:
+        await connection.execute("SELECT pg_advisory_lock(hashtext($1))", TEMPLATE)
+        version = migrations_hash()
+        template = await connection.fetchrow(
+            "SELECT shobj_description(oid, 'pg_database') AS version"
+            " FROM pg_database WHERE datname = $1",
+            TEMPLATE,
+        )
+        if template is None or template["version"] != version:
+            if template is not None:
+                await connection.execute(
+                    f'ALTER DATABASE "{TEMPLATE}" WITH IS_TEMPLATE false'
+                )
+                await connection.execute(f'DROP DATABASE "{TEMPLATE}" WITH (FORCE)')
+            await migrate_template(connection, version)
+        await connection.execute(f'DROP DATABASE IF EXISTS "{DATABASE}" WITH (FORCE)')
+        await connection.execute(f'CREATE DATABASE "{DATABASE}" TEMPLATE "{TEMPLATE}"')
+    finally:
+        await connection.execute("SELECT pg_advisory_unlock(hashtext($1))", TEMPLATE)
+        await connection.close()
+
+
+async def drop_database() -> None:
+    connection = await asyncpg.connect(admin_dsn())
+    try:
+        await connection.execute(f'DROP DATABASE IF EXISTS "{DATABASE}" WITH (FORCE)')
+    finally:
+        await connection.close()
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    # one loop for the session, pooled asyncpg connections are bound to it
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+async def database():
+    await create_database()
+    yield
+    await engine.dispose()
+    await drop_database()
+
+
+@pytest.fixture
+async def empty_database():
+    """
+    Name of a database without tables, for migration tests
+    """
+    name = f"{DATABASE}_empty"
+    connection = await asyncpg.connect(admin_dsn())
+    try:
+        await connection.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        await connection.execute(f'CREATE DATABASE "{name}"')
+        yield name
+    finally:
+        await connection.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        await connection.close()
+
+
+@pytest.fixture(autouse=True)
+async def connection(database):
+    """
+    Connection of the test's outer transaction, rolled back after the test
+    """
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        session_factory.configure(
+            bind=connection, join_transaction_mode="create_savepoint"
+        )
+        try:
+            yield connection
+        finally:
+            session_factory.configure(
+                bind=engine, join_transaction_mode="conservative_savepoint"
+            )
+            if transaction.is_active:  # tests may roll it back themselves
+                await transaction.rollback()
+
+
+@pytest.fixture
+async def db(connection):
+    async with session_factory() as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
+async def fake_redis():
+    redis = fakeredis.aioredis.FakeRedis(encoding="utf8", decode_responses=True)
+    yield redis
+    await redis.close()
+
+
+@pytest.fixture(autouse=True)
+async def redis(fake_redis):
+    """
+    In-memory Redis behind ``get_cache``/``get_cache_context`` and pub/sub
+    """
+    clients = dict(redis_client._clients)
+    redis_client._clients.update(
+        primary=fake_redis, replica=fake_redis, pubsub=fake_redis
+    )
+    try:
+        yield fake_redis
+    finally:
+        redis_client._clients.clear()
+        redis_client._clients.update(clients)
+        await fake_redis.flushall()
+
+
+@pytest.fixture
+async def client():
+    """
+    HTTP client of the app without the lifespan, so no background services or
+    warm-up; requests share the test's transaction and Redis
+    """
+    from app import app
+
+    app.state.ready = True
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
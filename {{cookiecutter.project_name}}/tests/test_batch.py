@@ -0,0 +1,18 @@
+async def test_non_latin1_header_is_rejected(client):
+    response = await client.post(
+        "/api/v1/batch",
+        json={"requests": [{"url": "/ready", "headers": {"x-currency": "€"}}]},
+    )
+
+    assert response.status_code == 400
+
+
+async def test_batch(client):
+    response = await client.post(
+        "/api/v1/batch",
+        json={"requests": [{"url": "/ready"}, {"url": "/not-found"}]},
+    )
+
+    assert response.status_code == 200
+    statuses = [item["status"] for item in response.json()["responses"]]
+    assert statuses == [200, 404]
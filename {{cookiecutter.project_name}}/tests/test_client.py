@@ -0,0 +1,36 @@
+from sqlalchemy import select
+
+from core.jobs import job_queue
+from models.user import User
+
+
+async def test_ready(client):
+    response = await client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json() == {"ready": True}
+
+
+async def test_not_found(client):
+    response = await client.get("/not-found")
+
+    assert response.status_code == 404
+    assert response.headers["content-type"] == "application/json"
+
+
+async def test_register(client, db, redis):
+    response = await client.post(
+        "/api/v1/auth/register",
+        json={
+            "email": "client@example.com",
+            "password": "password",
+            "first_name": "Client",
+            "last_name": "Test",
+        },
+    )
+
+    assert response.status_code == 201
+    user = await db.scalar(select(User).where(User.email == "client@example.com"))
+    assert str(user.id) == response.json()["id"]
+    # the welcome email went to the in-memory queue
+    assert await redis.llen(job_queue.queue_key) == 1
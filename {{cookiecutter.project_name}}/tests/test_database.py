@@ -0,0 +1,40 @@
+from sqlalchemy import func, select
+
+from api.v1.auth.utils import create_user
+from core import engine, get_db_context
+from models.user import User
+
+EMAIL = "isolation@example.com"
+
+
+async def count_users(db) -> int:
+    return await db.scalar(select(func.count()).where(User.email == EMAIL))
+
+
+async def test_commit_is_rolled_back_with_the_test(connection, db):
+    # committed by its own session, like a request would
+    await create_user(EMAIL, "password", "Isolation", "Test")
+    assert await count_users(db) == 1
+
+    # what the fixture does after the test
+    await connection.get_transaction().rollback()
+
+    async with engine.connect() as fresh:
+        assert await count_users(fresh) == 0
+
+
+async def test_rollback_keeps_the_test_transaction(db):
+    await create_user(EMAIL, "password", "Isolation", "Test")
+    async with get_db_context() as session:
+        session.add(
+            User(
+                email="rolled-back@example.com",
+                hashed_password="x",
+                first_name="Rolled",
+                last_name="Back",
+            )
+        )
+        await session.flush()
+        await session.rollback()
+
+    assert await count_users(db) == 1
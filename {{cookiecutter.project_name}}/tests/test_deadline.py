@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+
+from core.config import settings
+from core.deadline import deadline, parse_timeout, route_deadline
+from core.middleware import DeadlineMiddleware
+
+
+async def test_deadline_doesnt_outlive_the_request(client):
+    response = await client.get(
+        "/ready", headers={settings.REQUEST_TIMEOUT_HEADER: "1"}
+    )
+
+    assert response.status_code == 200
+    # ASGITransport runs the app in the test's task
+    assert deadline.get() is None
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "nan", "inf", "-inf", "soon", ""])
+def test_invalid_timeouts_fall_back_to_the_default(value):
+    assert parse_timeout(value) == settings.REQUEST_DEFAULT_TIMEOUT
+
+
+def test_timeout_is_capped():
+    assert parse_timeout("2.5") == 2.5
+    assert parse_timeout("1e9") == settings.REQUEST_MAX_TIMEOUT
+
+
+async def test_route_deadline_cancels_the_handler():
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware)
+
+    @app.get("/slow", dependencies=[Depends(route_deadline(0.05))])
+    async def slow():
+        await asyncio.sleep(5)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        started = time.monotonic()
+        response = await c.get("/slow")
+
+    assert response.status_code == 504
+    assert time.monotonic() - started < 1
@@ -0,0 +1,26 @@
+import logging
+
+import orjson
+
+from core.logging import JSONLogFormatter
+from core.query_budget import QueryStats, query_stats
+from core.tracing import current_span, start_trace
+
+
+def test_json_log_has_trace_and_query_counts():
+    span = start_trace("GET /")
+    stats = QueryStats()
+    stats.sql, stats.redis = 3, 2
+    span_token, stats_token = current_span.set(span), query_stats.set(stats)
+    try:
+        record = logging.LogRecord("app", logging.INFO, __file__, 1, "hi", (), None)
+        line = orjson.loads(JSONLogFormatter().format(record))
+    finally:
+        current_span.reset(span_token)
+        query_stats.reset(stats_token)
+
+    assert line["message"] == "hi"
+    assert line["trace_id"] == span.trace_id
+    assert line["span_id"] == span.span_id
+    assert line["sql_count"] == 3
+    assert line["redis_count"] == 2
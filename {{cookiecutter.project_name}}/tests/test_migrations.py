@@ -0,0 +1,27 @@
+import asyncio
+
+import asyncpg
+from alembic import command
+from alembic.script import ScriptDirectory
+
+from .conftest import URL, alembic_config
+
+
+async def current_revision(database: str) -> str:
+    url = URL.set(drivername="postgresql", database=database)
+    connection = await asyncpg.connect(url.render_as_string(hide_password=False))
+    try:
+        return await connection.fetchval("SELECT version_num FROM alembic_version")
+    finally:
+        await connection.close()
+
+
+async def test_dry_run_is_rolled_back(empty_database):
+    config = alembic_config(empty_database)
+    base = ScriptDirectory.from_config(config).get_base()
+    await asyncio.to_thread(command.upgrade, config, base)
+
+    dry_run = alembic_config(empty_database, "dry_run=true")
+    await asyncio.to_thread(command.upgrade, dry_run, "head")
+
+    assert await current_revision(empty_database) == base
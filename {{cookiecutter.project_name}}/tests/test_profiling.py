@@ -0,0 +1,18 @@
+from core.config import settings
+from core.profiling import sign_profile_header, verify_profile_header
+
+
+def test_profile_header():
+    value = sign_profile_header("/health")
+
+    assert verify_profile_header(value, "/health")
+    assert not verify_profile_header(value, "/ready")
+    assert not verify_profile_header("9999999999.é", "/health")
+
+
+async def test_non_ascii_profile_header(client):
+    response = await client.get(
+        "/ready", headers={settings.PROFILING_HEADER: "9999999999.é".encode("latin-1")}
+    )
+
+    assert response.status_code == 200
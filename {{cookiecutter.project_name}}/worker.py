@@ -0,0 +1,9 @@
+import asyncio
+
+import api.v1.auth.jobs  # noqa, registers the jobs
+from core.jobs import Worker
+from core.logging import setup_logging
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(Worker().run())